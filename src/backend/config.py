@@ -2,6 +2,7 @@
 Application configuration and constants.
 """
 
+from pathlib import Path
 from typing import List
 
 # Asset classes used throughout the application
@@ -18,6 +19,11 @@ CORS_CREDENTIALS = True
 CORS_METHODS = ["*"]
 CORS_HEADERS = ["*"]
 
+# Storage configuration
+DATA_DIR = Path(__file__).parent.parent.parent / "data"  # project-root data/
+DB_POOL_SIZE = 8  # Persistent SQLite connections kept open for request threads
+DB_MAX_OVERFLOW = 4  # Extra connections allowed under burst load
+
 # Simulation defaults
 DEFAULT_SIMULATIONS = 10000
 MIN_SIMULATIONS = 500
@@ -26,10 +32,15 @@ MAX_SIMULATIONS = 100000
 # Fat-tail engine selection
 # Options: "optionB" (log-safe), "research" (arithmetic), "current" (existing)
 DEFAULT_FAT_TAIL_ENGINE = "kou_logsafe"  # Winner! Achieves target 2-5% impact
+ANTITHETIC_VARIATES = True  # Mirror normal draws (z, -z) across sims for variance reduction
+GAUSSIAN_T_DF = 100  # Student-t df at or above which body shocks are drawn as normals
+ENGINE_VERSION = 1  # Bump whenever a change alters seeded simulation results (part of every ETag)
 
 # Performance settings
 USE_PARALLEL_PROCESSING = False  # Set to True if using multiprocessing
-CHUNK_SIZE = 1000  # For batched processing
+CHUNK_SIZE = 1000  # Minimum sims per worker when a run is split across processes
+CUDA_MIN_SIMS = 50000  # Run the balance recurrence on a CUDA GPU at or above this many sims
+SIM_CACHE_SIZE = 64  # Seeded /api/simulate results kept in the in-memory LRU
 
 # Logging configuration
 LOG_LEVEL = "INFO"
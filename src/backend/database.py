@@ -3,27 +3,53 @@ Database configuration and models for the retirement calculator.
 Now with optional encryption support for sensitive data.
 """
 
-from pathlib import Path
-from sqlalchemy import create_engine, Column, Integer, String, Text
+import time
+
+from sqlalchemy import create_engine, event, Column, Integer, String, LargeBinary
 from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy.pool import QueuePool
 
 # Handle both relative and absolute imports
 try:
-    from .encrypted_database import get_encryption_manager, EncryptedScenarioRow
+    from .config import DATA_DIR, DB_POOL_SIZE, DB_MAX_OVERFLOW
+    from .encrypted_database import (
+        get_encryption_manager, EncryptedScenarioRow, legacy_payload_to_bytes
+    )
 except ImportError:
-    from encrypted_database import get_encryption_manager, EncryptedScenarioRow
+    from config import DATA_DIR, DB_POOL_SIZE, DB_MAX_OVERFLOW
+    from encrypted_database import (
+        get_encryption_manager, EncryptedScenarioRow, legacy_payload_to_bytes
+    )
 
-# Create data directory path relative to project root
-DATA_DIR = Path(__file__).parent.parent.parent / "data"
+# Create data directory at the project root
 DATA_DIR.mkdir(exist_ok=True)
 DB_PATH = DATA_DIR / "retire.db"
 
 # SQLite engine configuration
+# A QueuePool keeps connections (and their pragmas/WAL mmap) open across
+# requests instead of reopening the file per FastAPI worker thread.
 engine = create_engine(
     f"sqlite:///{DB_PATH}", 
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
 )
 
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _connection_record):
+    """Apply performance pragmas to every new SQLite connection."""
+    cursor = dbapi_conn.cursor()
+    cursor.executescript(
+        "PRAGMA journal_mode=WAL;"      # readers don't block the writer
+        "PRAGMA synchronous=NORMAL;"    # fsync at checkpoints, safe with WAL
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA cache_size=-65536;"     # 64 MiB page cache
+        "PRAGMA mmap_size=268435456;"   # 256 MiB memory-mapped I/O
+    )
+    cursor.close()
+
 # Base class for SQLAlchemy models
 Base = declarative_base()
 
@@ -34,12 +60,33 @@ class ScenarioRow(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(128), unique=True, nullable=False)
-    payload = Column(Text, nullable=False)  # JSON string of Scenario
+    payload = Column(LargeBinary, nullable=False)  # Encrypted JSON of Scenario (Fernet token)
+    # Revision stamp (ns since epoch); keys the decrypted-payload cache
+    updated_at = Column(Integer, nullable=False, default=time.time_ns, onupdate=time.time_ns)
 
 
 # Create tables if they don't exist
 Base.metadata.create_all(engine)
 
+# Bring databases created by older versions up to the current schema
+with engine.begin() as conn:
+    columns = {c[1] for c in conn.exec_driver_sql("PRAGMA table_info(scenarios)")}
+    if "updated_at" not in columns:
+        conn.exec_driver_sql(
+            "ALTER TABLE scenarios ADD COLUMN updated_at INTEGER NOT NULL DEFAULT 0"
+        )
+    
+    # Payloads used to be stored as TEXT (base64 of the Fernet token);
+    # convert any remaining rows to BLOBs in this one transaction
+    text_rows = conn.exec_driver_sql(
+        "SELECT id, payload FROM scenarios WHERE typeof(payload) = 'text'"
+    ).fetchall()
+    for row_id, text_payload in text_rows:
+        conn.exec_driver_sql(
+            "UPDATE scenarios SET payload = ?, updated_at = ? WHERE id = ?",
+            (legacy_payload_to_bytes(text_payload), time.time_ns(), row_id),
+        )
+
 
 def get_session() -> Session:
     """Get a new database session"""
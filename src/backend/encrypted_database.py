@@ -4,24 +4,63 @@ Uses Fernet symmetric encryption from cryptography library.
 """
 
 import os
-import json
+import time
 import base64
-from typing import Optional, Dict, Any
+import hashlib
+import zlib
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
 from pathlib import Path
-from cryptography.fernet import Fernet
+import orjson
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from dotenv import load_dotenv
 
+try:
+    from .config import DATA_DIR
+except ImportError:
+    from config import DATA_DIR
+
 # Load environment variables
 load_dotenv()
 
+# Key derivation parameters (changing these changes the derived key)
+KDF_SALT = b'retirement-calc-salt-v1'  # In production, use a random salt per user
+KDF_ITERATIONS = 100000
+KDF_TARGET_MS = 15.0  # Target derivation time for DB_KDF_ITERATIONS=auto
+HKDF_INFO = b'retire-fernet-v1'
+
+# JSON payload framing (first plaintext byte); untagged rows predate framing
+PAYLOAD_PLAIN = b'\x00'
+PAYLOAD_ZLIB = b'\x01'
+PAYLOAD_ZLIB_LEVEL = 1  # Fastest; the ciphertext is incompressible either way
+
+
+def _write_private_file(path: Path, data: bytes) -> None:
+    """Atomically write data to a file readable only by the owner (0600)."""
+    path.parent.mkdir(exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
 
 class EncryptionManager:
     """Manages encryption/decryption of sensitive data."""
     
     def __init__(self, key: Optional[str] = None):
         """Initialize with encryption key from environment or parameter."""
+        # Environment is read once here, never on the encrypt/decrypt path
+        self.enabled = os.getenv('DB_ENCRYPTION_ENABLED', 'true').lower() == 'true'
+        self.kdf = os.getenv('DB_KDF', 'hkdf').lower()  # "hkdf" | "pbkdf2"
+        self._password = None
+        self._legacy_decryptor = None
+        
         if key:
             self.key = key
         else:
@@ -32,67 +71,275 @@ class EncryptionManager:
                 env_key = "default-development-key-change-this"
             
             # Derive a proper encryption key from the password
+            self._password = env_key
             self.key = self._derive_key(env_key)
         
         self.fernet = Fernet(self.key)
-        self.enabled = os.getenv('DB_ENCRYPTION_ENABLED', 'true').lower() == 'true'
+        
+        if not self.enabled:
+            # Bind pass-through versions so the disabled path stores the
+            # plaintext bytes with no per-call flag check
+            self.encrypt = self.decrypt = self._passthrough
+            self.encrypt_many = self.decrypt_many = list
+            self.encrypt_dict = orjson.dumps
+            self.decrypt_dict = orjson.loads
+    
+    @staticmethod
+    def _passthrough(data: bytes) -> bytes:
+        """Disabled-mode encrypt/decrypt: bytes are stored as-is."""
+        return data
     
     def _derive_key(self, password: str) -> bytes:
-        """Derive a Fernet-compatible key from a password."""
+        """Derive a Fernet-compatible key using the configured KDF."""
+        if self.kdf == 'pbkdf2':
+            return self._derive_key_pbkdf2(password, self._pbkdf2_iterations())
+        return self._derive_key_hkdf(password)
+    
+    @staticmethod
+    def _pbkdf2_iterations() -> int:
+        """
+        PBKDF2 iteration count from DB_KDF_ITERATIONS.
+        
+        Unset keeps the original 100,000. "auto" calibrates once per host and
+        pins the result in DATA_DIR/.kdf.json; deleting that file changes the
+        derived key, so pin the logged value in .env before moving hosts.
+        """
+        setting = os.getenv('DB_KDF_ITERATIONS', '').strip().lower()
+        if not setting:
+            return KDF_ITERATIONS
+        if setting != 'auto':
+            return int(setting)
+        
+        params_path = DATA_DIR / ".kdf.json"
+        fingerprint = {
+            "algorithm": "pbkdf2-sha256",
+            "salt": hashlib.sha256(KDF_SALT).hexdigest(),
+        }
+        try:
+            params = orjson.loads(params_path.read_bytes())
+            if all(params.get(k) == v for k, v in fingerprint.items()):
+                return int(params["iterations"])
+        except FileNotFoundError:
+            pass
+        
+        iterations = EncryptionManager._calibrate_iters(KDF_TARGET_MS)
+        print(f"Calibrated PBKDF2 to {iterations} iterations (~{KDF_TARGET_MS:.0f} ms)")
+        _write_private_file(params_path, orjson.dumps({**fingerprint, "iterations": iterations}))
+        return iterations
+    
+    @staticmethod
+    def _calibrate_iters(target_ms: float = KDF_TARGET_MS) -> int:
+        """Largest PBKDF2 iteration count that derives within target_ms on this host."""
+        def elapsed_ms(iterations: int) -> float:
+            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32,
+                             salt=KDF_SALT, iterations=iterations)
+            start = time.perf_counter()
+            kdf.derive(b"calibration")
+            return (time.perf_counter() - start) * 1000.0
+        
+        # Double until the target is exceeded, then bisect to ~5%
+        lo = hi = 1000
+        while elapsed_ms(hi) <= target_ms:
+            lo, hi = hi, hi * 2
+        while hi - lo > max(lo // 20, 1):
+            mid = (lo + hi) // 2
+            if elapsed_ms(mid) <= target_ms:
+                lo = mid
+            else:
+                hi = mid
+        return lo
+    
+    def _derive_key_hkdf(self, password: str) -> bytes:
+        """
+        Derive a Fernet-compatible key with HKDF.
+        
+        DB_ENCRYPTION_KEY is a machine-provisioned secret rather than a
+        user-typed password, so key stretching buys nothing here.
+        """
+        kdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=KDF_SALT,
+            info=HKDF_INFO,
+        )
+        return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+    
+    def _derive_key_pbkdf2(self, password: str, iterations: int = KDF_ITERATIONS) -> bytes:
+        """
+        Derive a Fernet-compatible key with PBKDF2 (original scheme).
+        
+        With DB_ENCRYPTION_KEY_CACHE=1 the derived key is cached in DATA_DIR,
+        keyed by a fingerprint of the KDF inputs, so restarts skip PBKDF2.
+        """
+        cache_path = None
+        if os.getenv('DB_ENCRYPTION_KEY_CACHE', '0') == '1':
+            fingerprint = hashlib.sha256(
+                password.encode() + KDF_SALT + f"v1-{iterations}".encode()
+            ).hexdigest()
+            cache_path = DATA_DIR / f".fernetkey-{fingerprint}"
+            try:
+                return cache_path.read_bytes()
+            except FileNotFoundError:
+                pass
+        
         # Use PBKDF2 to derive a key from the password
-        salt = b'retirement-calc-salt-v1'  # In production, use a random salt per user
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
-            salt=salt,
-            iterations=100000,
+            salt=KDF_SALT,
+            iterations=iterations,
         )
         key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+        
+        if cache_path is not None:
+            _write_private_file(cache_path, key)
         return key
     
-    def encrypt(self, data: str) -> str:
-        """Encrypt a string and return base64-encoded encrypted data."""
-        if not self.enabled:
-            return data
-        
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypt bytes and return the raw Fernet token bytes."""
         if data is None:
             return None
             
-        encrypted = self.fernet.encrypt(data.encode())
-        return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        return self.fernet.encrypt(data)
     
-    def decrypt(self, encrypted_data: str) -> str:
-        """Decrypt base64-encoded encrypted data and return original string."""
-        if not self.enabled:
-            return encrypted_data
+    def _get_legacy_decryptor(self) -> MultiFernet:
+        """Decryptor for rows written by older versions (PBKDF2 key)."""
+        if self._legacy_decryptor is None:
+            fernets = [self.fernet]
+            if self._password is not None:
+                # Original scheme: PBKDF2 with the default iteration count
+                legacy_key = self._derive_key_pbkdf2(self._password)
+                if legacy_key != self.key:
+                    fernets.append(Fernet(legacy_key))
+            self._legacy_decryptor = MultiFernet(fernets)
+        return self._legacy_decryptor
+    
+    def _decrypt_token(self, token: bytes) -> bytes:
+        """Decrypt a Fernet token, accepting tokens written by older versions."""
+        try:
+            return self.fernet.decrypt(token)
+        except InvalidToken:
+            pass
         
+        # Older rows used the PBKDF2 key and/or wrapped the token in a second
+        # base64 layer; the legacy key is only derived when such a row is read
+        legacy = self._get_legacy_decryptor()
+        try:
+            return legacy.decrypt(token)
+        except InvalidToken:
+            return legacy.decrypt(base64.urlsafe_b64decode(token))
+    
+    def decrypt(self, encrypted_data: bytes) -> bytes:
+        """Decrypt Fernet token bytes and return the original bytes."""
         if encrypted_data is None:
             return None
             
         try:
-            decoded = base64.urlsafe_b64decode(encrypted_data.encode('utf-8'))
-            decrypted = self.fernet.decrypt(decoded)
-            return decrypted.decode('utf-8')
+            return self._decrypt_token(encrypted_data)
         except Exception as e:
             # If decryption fails, might be unencrypted data from migration
             print(f"Decryption failed, returning as-is: {e}")
             return encrypted_data
     
-    def encrypt_dict(self, data: Dict[str, Any]) -> str:
-        """Encrypt a dictionary by converting to JSON first."""
-        if not self.enabled:
-            return json.dumps(data)
+    def encrypt_many(self, data: List[bytes]) -> List[bytes]:
+        """Encrypt a batch of byte strings, reusing one Fernet instance."""
+        fernet_encrypt = self.fernet.encrypt
+        return [fernet_encrypt(d) for d in data]
+    
+    def decrypt_many(self, encrypted_data: List[bytes]) -> List[bytes]:
+        """Decrypt a batch of tokens, reusing one Fernet instance."""
+        fernet_decrypt = self.fernet.decrypt
+        try:
+            return [fernet_decrypt(d) for d in encrypted_data]
+        except Exception:
+            # Some rows need the per-row fallback (legacy tokens, unencrypted data)
+            return [self.decrypt(d) for d in encrypted_data]
+    
+    def encrypt_json_bytes(self, data: bytes) -> bytes:
+        """Compress (when it helps), tag and encrypt a JSON payload."""
+        return self.encrypt(_pack_json(data))
+    
+    def decrypt_json_bytes(self, encrypted_data: bytes, strict: bool = False) -> bytes:
+        """
+        Decrypt a payload from encrypt_json_bytes (or an untagged legacy row).
         
-        json_str = json.dumps(data)
-        return self.encrypt(json_str)
+        With strict, a row that neither decrypts nor is stored unencrypted
+        raises InvalidToken instead of coming back as the raw token.
+        """
+        if strict:
+            return self._decrypt_json_strict(encrypted_data)
+        return _unpack_json(self.decrypt(encrypted_data))
+    
+    def decrypt_json_many(self, encrypted_data: List[bytes], strict: bool = False) -> List[Optional[bytes]]:
+        """Batch version of decrypt_json_bytes; with strict, undecryptable rows come back as None."""
+        if not strict:
+            return [_unpack_json(d) for d in self.decrypt_many(encrypted_data)]
+        payloads = []
+        for d in encrypted_data:
+            try:
+                payloads.append(self._decrypt_json_strict(d))
+            except InvalidToken:
+                payloads.append(None)
+        return payloads
     
-    def decrypt_dict(self, encrypted_data: str) -> Dict[str, Any]:
+    def _decrypt_json_strict(self, encrypted_data: bytes) -> bytes:
+        """decrypt_json_bytes that raises InvalidToken rather than pass a token through."""
+        if self.enabled:
+            try:
+                return _unpack_json(self._decrypt_token(encrypted_data))
+            except (InvalidToken, ValueError, zlib.error):
+                pass
+        # Rows stored unencrypted (before encryption, or with it disabled) are
+        # JSON objects; anything else is a token for another key or corrupt
+        try:
+            data = _unpack_json(encrypted_data)
+        except zlib.error:
+            raise InvalidToken
+        if data.lstrip()[:1] != b"{":
+            raise InvalidToken
+        return data
+    
+    def encrypt_dict(self, data: Dict[str, Any]) -> bytes:
+        """Encrypt a dictionary by converting to JSON first."""
+        return self.encrypt(orjson.dumps(data))
+    
+    def decrypt_dict(self, encrypted_data: bytes) -> Dict[str, Any]:
         """Decrypt and return as dictionary."""
-        if not self.enabled:
-            return json.loads(encrypted_data)
-        
-        json_str = self.decrypt(encrypted_data)
-        return json.loads(json_str)
+        return orjson.loads(self.decrypt(encrypted_data))
+
+
+def _pack_json(data: bytes) -> bytes:
+    """Prefix a JSON payload with its framing tag, zlib-compressing when smaller."""
+    compressed = zlib.compress(data, PAYLOAD_ZLIB_LEVEL)
+    if len(compressed) < len(data):
+        return PAYLOAD_ZLIB + compressed
+    return PAYLOAD_PLAIN + data
+
+
+def _unpack_json(data: bytes) -> bytes:
+    """Inverse of _pack_json; untagged payloads are returned unchanged."""
+    tag = data[:1]
+    if tag == PAYLOAD_ZLIB:
+        return zlib.decompress(data[1:])
+    if tag == PAYLOAD_PLAIN:
+        return data[1:]
+    return data
+
+
+def legacy_payload_to_bytes(payload: str) -> bytes:
+    """
+    Convert a payload stored as TEXT by older versions to BLOB bytes.
+    
+    Double-base64 tokens are unwrapped to the raw Fernet token; anything else
+    (current tokens, unencrypted JSON) is stored as its UTF-8 bytes.
+    """
+    try:
+        inner = base64.urlsafe_b64decode(payload.encode('ascii'))
+        if inner.startswith(b'gAAAAA'):  # base64 of the Fernet version byte
+            return inner
+    except (ValueError, UnicodeEncodeError):
+        pass
+    return payload.encode('utf-8')
 
 
 class EncryptedScenarioRow:
@@ -110,12 +357,12 @@ class EncryptedScenarioRow:
     @property
     def payload(self):
         """Decrypt payload on access."""
-        return self.enc.decrypt(self.row.payload)
+        return self.enc.decrypt_json_bytes(self.row.payload)
     
     @payload.setter
-    def payload(self, value: str):
+    def payload(self, value: bytes):
         """Encrypt payload on setting."""
-        self.row.payload = self.enc.encrypt(value)
+        self.row.payload = self.enc.encrypt_json_bytes(value)
     
     def to_dict(self):
         """Return decrypted dictionary representation."""
@@ -126,15 +373,10 @@ class EncryptedScenarioRow:
         }
 
 
-# Global encryption manager instance
-_encryption_manager = None
-
+@lru_cache(maxsize=1)
 def get_encryption_manager() -> EncryptionManager:
-    """Get or create the global encryption manager."""
-    global _encryption_manager
-    if _encryption_manager is None:
-        _encryption_manager = EncryptionManager()
-    return _encryption_manager
+    """Get the global encryption manager (created lazily on first call)."""
+    return EncryptionManager()
 
 
 def generate_new_key() -> str:
@@ -147,11 +389,11 @@ def test_encryption():
     manager = get_encryption_manager()
     
     # Test string encryption
-    original = "Sensitive financial data: $1,500,000"
+    original = b"Sensitive financial data: $1,500,000"
     encrypted = manager.encrypt(original)
     decrypted = manager.decrypt(encrypted)
     
-    assert original == decrypted, "String encryption/decryption failed"
+    assert original == decrypted, "Bytes encryption/decryption failed"
     assert encrypted != original if manager.enabled else encrypted == original
     
     # Test dictionary encryption
@@ -165,6 +407,11 @@ def test_encryption():
     
     assert original_dict == decrypted_dict, "Dict encryption/decryption failed"
     
+    # Test compressed JSON payloads (and untagged legacy payloads)
+    original_json = orjson.dumps([original_dict] * 20)
+    assert manager.decrypt_json_bytes(manager.encrypt_json_bytes(original_json)) == original_json
+    assert manager.decrypt_json_bytes(manager.encrypt(original_json)) == original_json
+    
     print("✅ Encryption tests passed!")
     if manager.enabled:
         print(f"   Original: {original[:20]}...")
@@ -3,39 +3,63 @@ FastAPI application for retirement calculator with Monte Carlo simulation.
 """
 
 # Standard library imports
-import json
+import asyncio
+import hashlib
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
 
 # Third-party imports
-from fastapi import FastAPI, HTTPException
+import anyio
+import numpy as np
+import orjson
+from cryptography.fernet import InvalidToken
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # Local application imports
 try:
     # Try relative imports (when running as module)
     from .config import (
         API_TITLE, API_DESCRIPTION, API_VERSION,
-        CORS_ORIGINS, CORS_CREDENTIALS, CORS_METHODS, CORS_HEADERS
+        CORS_ORIGINS, CORS_CREDENTIALS, CORS_METHODS, CORS_HEADERS,
+        USE_PARALLEL_PROCESSING, CHUNK_SIZE, SIM_CACHE_SIZE,
+        ENGINE_VERSION, DEFAULT_FAT_TAIL_ENGINE, ANTITHETIC_VARIATES, GAUSSIAN_T_DF, CUDA_MIN_SIMS
     )
-    from .database import engine, ScenarioRow, get_session
-    from .encrypted_database import get_encryption_manager, EncryptedScenarioRow
+    from .database import ScenarioRow, get_session
+    from .encrypted_database import get_encryption_manager
     from .models import (
         Scenario, Account, ConsultingLadder, Spending, 
-        IncomeStream, LumpEvent, ToyPurchase
+        IncomeStream, LumpEvent, ToyPurchase,
+        SimulationResult, ScenarioSummary
     )
     from .monte_carlo import Engine
+    from .monte_carlo.jobs import init_worker, run_engine_job, simulate_chunk_job
+    from .monte_carlo.kernels import HAS_AOT, HAS_CUDA, HAS_NUMBA, max_threads, physical_cores, set_threads
 except ImportError:
     # Fall back to absolute imports (when running directly)
     from config import (
         API_TITLE, API_DESCRIPTION, API_VERSION,
-        CORS_ORIGINS, CORS_CREDENTIALS, CORS_METHODS, CORS_HEADERS
+        CORS_ORIGINS, CORS_CREDENTIALS, CORS_METHODS, CORS_HEADERS,
+        USE_PARALLEL_PROCESSING, CHUNK_SIZE, SIM_CACHE_SIZE,
+        ENGINE_VERSION, DEFAULT_FAT_TAIL_ENGINE, ANTITHETIC_VARIATES, GAUSSIAN_T_DF, CUDA_MIN_SIMS
     )
-    from database import engine, ScenarioRow, get_session
-    from encrypted_database import get_encryption_manager, EncryptedScenarioRow
+    from database import ScenarioRow, get_session
+    from encrypted_database import get_encryption_manager
     from models import (
         Scenario, Account, ConsultingLadder, Spending, 
-        IncomeStream, LumpEvent, ToyPurchase
+        IncomeStream, LumpEvent, ToyPurchase,
+        SimulationResult, ScenarioSummary
     )
     from monte_carlo import Engine
+    from monte_carlo.jobs import init_worker, run_engine_job, simulate_chunk_job
+    from monte_carlo.kernels import HAS_AOT, HAS_CUDA, HAS_NUMBA, max_threads, physical_cores, set_threads
 
 
 # ============================
@@ -57,6 +81,142 @@ app.add_middleware(
 )
 
 
+# Simulations never run on the event loop: with USE_PARALLEL_PROCESSING they
+# go to worker processes, otherwise to threads capped by their own limiter so
+# a burst of simulations can't starve the shared threadpool used by the
+# lightweight endpoints. Either way concurrency is one simulation per
+# physical core: the kernels are compute bound, so hyperthreads add no
+# throughput
+_SIM_WORKERS = physical_cores()
+# Workers are spawned, not forked: Numba's thread pool does not survive fork
+_SIM_POOL = ProcessPoolExecutor(
+    max_workers=_SIM_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+    initializer=init_worker,
+) if USE_PARALLEL_PROCESSING else None
+_SIM_LIMITER = anyio.CapacityLimiter(_SIM_WORKERS)
+
+
+def _run_engine_threaded(scenario: Scenario) -> dict:
+    """
+    Run the engine on a limiter thread, sharing the kernel threads between
+    the simulations in flight so concurrent requests don't oversubscribe
+    the cores (a lone request still gets all of them).
+    """
+    set_threads(max_threads() // max(1, int(_SIM_LIMITER.borrowed_tokens)))
+    # A fresh Engine per request: setup is ~0.1 ms (the CMA factorization
+    # is cached across instances) and each Engine owns its RNG stream, so
+    # sharing instances between concurrent requests would break seeding
+    return Engine(scenario).run()
+
+
+def _split_chunks(scenario: Scenario) -> int:
+    """Worker chunks a run is split into (0 when it runs as a single job)."""
+    if _SIM_POOL is None or scenario.sims < 2 * CHUNK_SIZE:
+        return 0
+    return max(1, min(_SIM_WORKERS, scenario.sims // CHUNK_SIZE))
+
+
+async def _run_engine_split(scenario: Scenario) -> dict:
+    """
+    Split one large run into per-worker chunks of sims and merge the paths.
+    
+    Chunk i draws from jumped substream i of the scenario seed, so chunks
+    never overlap each other (or other seeds' runs) and a seeded scenario
+    stays reproducible for a given worker count.
+    """
+    sizes = [len(c) for c in np.array_split(np.arange(scenario.sims), _split_chunks(scenario))]
+    loop = asyncio.get_running_loop()
+    scenario_json = scenario.model_dump_json()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(_SIM_POOL, simulate_chunk_job, scenario_json, size, i)
+        for i, size in enumerate(sizes)
+    ))
+    return Engine(scenario).summarize(np.concatenate(chunks, axis=1))
+
+
+# Seeded runs are deterministic, so their summaries are kept in an LRU keyed
+# by a hash of the scenario; unseeded runs are never cached. Only touched
+# from the event loop, so it needs no lock
+_SIM_CACHE: "OrderedDict[str, dict]" = OrderedDict()
+
+
+# Everything outside the scenario that changes a seeded run's numbers, so a
+# deploy or config change never revalidates results computed under the old one
+_RESULTS_FINGERPRINT = repr((
+    API_VERSION, ENGINE_VERSION, DEFAULT_FAT_TAIL_ENGINE, ANTITHETIC_VARIATES,
+    GAUSSIAN_T_DF, HAS_NUMBA, HAS_AOT, HAS_CUDA, CUDA_MIN_SIMS,
+)).encode()
+
+
+def _scenario_etag(scenario: Scenario) -> str:
+    """
+    Quoted ETag for a seeded scenario: hash of its JSON, the results
+    fingerprint and the worker split (each chunk draws its own substream).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(_RESULTS_FINGERPRINT)
+    h.update(b"%d|" % _split_chunks(scenario))
+    h.update(scenario.model_dump_json().encode())
+    return f'"{h.hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches etag: "*", or any entry of the
+    comma-separated list, compared weakly (a W/ prefix is ignored).
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+async def _run_simulation(scenario: Scenario) -> dict:
+    """Run the engine off the event loop and return the summary."""
+    if _SIM_POOL is not None:
+        if _split_chunks(scenario):
+            return await _run_engine_split(scenario)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_SIM_POOL, run_engine_job, scenario.model_dump_json())
+    return await anyio.to_thread.run_sync(
+        _run_engine_threaded, scenario, limiter=_SIM_LIMITER
+    )
+
+
+# Revision reads per get_scenario before giving up on a row that keeps changing
+_GET_SCENARIO_ATTEMPTS = 3
+
+# Compiled once; serializes saved scenarios straight to JSON bytes
+_SCENARIO_ADAPTER = TypeAdapter(Scenario)
+
+
+@lru_cache(maxsize=256)
+def _decrypted_scenario(sid: int, updated_at: int) -> bytes:
+    """
+    Decrypted JSON payload of one scenario revision (cached per revision).
+    
+    Raises LookupError if that revision no longer exists (deleted or saved
+    again since updated_at was read), so a payload is never cached under
+    another revision's key. Saves and deletes leave old revisions' entries
+    unreachable, so they simply age out of the LRU.
+    """
+    with get_session() as s:
+        payload = s.execute(
+            select(ScenarioRow.payload)
+            .where(ScenarioRow.id == sid, ScenarioRow.updated_at == updated_at)
+        ).scalar_one_or_none()
+    if payload is None:
+        raise LookupError(sid, updated_at)
+    # Strict: an undecryptable row raises InvalidToken (never cached)
+    # instead of being served as JSON
+    return get_encryption_manager().decrypt_json_bytes(payload, strict=True)
+
+
 # ============================
 # API Routes
 # ============================
@@ -70,9 +230,8 @@ def root():
     }
 
 
-@app.get("/api/default_scenario")
-def default_scenario() -> Scenario:
-    """Get a default example scenario for testing."""
+def _build_default_scenario() -> Scenario:
+    """Build the default example scenario."""
     return Scenario(
         name="Example",
         current_age=45,
@@ -108,65 +267,125 @@ def default_scenario() -> Scenario:
     )
 
 
-@app.post("/api/simulate")
-def simulate(scenario: Scenario):
+# The default scenario never changes, so serialize it once at import
+_DEFAULT_SCENARIO_JSON = _build_default_scenario().model_dump_json().encode()
+
+
+@app.get("/api/default_scenario", response_model=Scenario)
+def default_scenario():
+    """Get a default example scenario for testing."""
+    return Response(_DEFAULT_SCENARIO_JSON, media_type="application/json")
+
+
+@app.post("/api/simulate", response_model=SimulationResult)
+async def simulate(scenario: Scenario, response: Response,
+                   if_none_match: Optional[str] = Header(None)):
     """
     Run Monte Carlo simulation for a given scenario.
     
+    Seeded scenarios are answered from an in-memory LRU when possible and
+    carry an ETag, so a client revalidating with If-None-Match gets a 304.
+    
     Args:
         scenario: The retirement scenario to simulate
         
     Returns:
         Simulation results with percentiles and success probability
     """
+    etag = None
+    if scenario.seed is not None:
+        etag = _scenario_etag(scenario)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        cached = _SIM_CACHE.get(etag)
+        if cached is not None:
+            _SIM_CACHE.move_to_end(etag)
+            return cached
     try:
         # Optional: Allow selecting fat-tail engine via query param or header
         # For now, use the default from config
-        eng = Engine(scenario)
-        result = eng.run()
-        return result
+        result = await _run_simulation(scenario)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if etag is not None:
+        _SIM_CACHE[etag] = result
+        if len(_SIM_CACHE) > SIM_CACHE_SIZE:
+            _SIM_CACHE.popitem(last=False)
+    return result
 
 
-@app.get("/api/scenarios")
+@app.get("/api/scenarios", response_model=List[ScenarioSummary])
 def list_scenarios():
     """List all saved scenarios."""
+    # Only id and name: the encrypted payload blobs are never loaded
     with get_session() as s:
-        rows = s.query(ScenarioRow).all()
+        rows = s.execute(select(ScenarioRow.id, ScenarioRow.name)).all()
         return [{"id": r.id, "name": r.name} for r in rows]
 
 
+@app.get("/api/scenarios/full")
+def list_scenarios_full():
+    """List all saved scenarios with their decrypted payloads."""
+    enc_manager = get_encryption_manager()
+    with get_session() as s:
+        rows = s.query(ScenarioRow).all()
+        payloads = enc_manager.decrypt_json_many([r.payload for r in rows], strict=True)
+        # Payloads are already JSON: splice them in rather than parse and
+        # re-serialize every scenario
+        items = []
+        for r, p in zip(rows, payloads):
+            if p is None:
+                # Wrong key or corrupt row: splicing the token in would send invalid JSON
+                print(f"WARNING: Skipping scenario {r.id}: payload could not be decrypted")
+                continue
+            items.append(orjson.dumps({"id": r.id, "name": r.name})[:-1] + b',"scenario":' + p + b"}")
+    return Response(b"[" + b",".join(items) + b"]", media_type="application/json")
+
+
 @app.get("/api/scenarios/{sid}")
 def get_scenario(sid: int):
     """Get a specific saved scenario by ID."""
-    enc_manager = get_encryption_manager()
-    with get_session() as s:
-        row = s.get(ScenarioRow, sid)
-        if not row:
+    # Read the current revision, then its payload; a delete or save landing
+    # in between makes the payload lookup miss, and the revision is re-read
+    for _ in range(_GET_SCENARIO_ATTEMPTS):
+        with get_session() as s:
+            updated_at = s.execute(
+                select(ScenarioRow.updated_at).where(ScenarioRow.id == sid)
+            ).scalar_one_or_none()
+        if updated_at is None:
             raise HTTPException(404, "Scenario not found")
-        # Decrypt the payload
-        encrypted_row = EncryptedScenarioRow(row, enc_manager)
-        return json.loads(encrypted_row.payload)
+        try:
+            payload = _decrypted_scenario(sid, updated_at)
+        except LookupError:
+            continue
+        except InvalidToken:
+            raise HTTPException(500, "Scenario could not be decrypted")
+        # The payload is already JSON, so skip the parse/re-serialize
+        return Response(payload, media_type="application/json")
+    raise HTTPException(409, "Scenario changed while it was being read; retry")
 
 
 @app.post("/api/scenarios")
 def save_scenario(scenario: Scenario):
     """Save or update a scenario."""
     enc_manager = get_encryption_manager()
+    payload = enc_manager.encrypt_json_bytes(_SCENARIO_ADAPTER.dump_json(scenario))
+    
+    # Upsert by name in a single statement (SQLite ON CONFLICT ... DO UPDATE);
+    # the upsert skips Column.onupdate, so updated_at is stamped explicitly
+    stmt = sqlite_insert(ScenarioRow).values(
+        name=scenario.name, payload=payload, updated_at=time.time_ns()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ScenarioRow.name],
+        set_={"payload": stmt.excluded.payload, "updated_at": stmt.excluded.updated_at},
+    ).returning(ScenarioRow.id)
+    
     with get_session() as s:
-        # Upsert by name
-        row = s.query(ScenarioRow).filter_by(name=scenario.name).first()
-        if row is None:
-            row = ScenarioRow(name=scenario.name)
-            encrypted_row = EncryptedScenarioRow(row, enc_manager)
-            encrypted_row.payload = scenario.model_dump_json()  # This will be encrypted
-            s.add(row)
-        else:
-            encrypted_row = EncryptedScenarioRow(row, enc_manager)
-            encrypted_row.payload = scenario.model_dump_json()  # This will be encrypted
+        sid = s.execute(stmt).scalar_one()
         s.commit()
-        return {"id": row.id, "name": row.name}
+    return {"id": sid, "name": scenario.name}
 
 
 @app.delete("/api/scenarios/{sid}")
@@ -178,7 +397,7 @@ def delete_scenario(sid: int):
             raise HTTPException(404, "Scenario not found")
         s.delete(row)
         s.commit()
-        return {"message": "Scenario deleted", "id": sid}
+    return {"message": "Scenario deleted", "id": sid}
 
 
 # Optional: Health check endpoint
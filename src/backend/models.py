@@ -3,8 +3,20 @@ Pydantic models for the retirement calculator.
 All data models and validation logic.
 """
 
-from typing import List, Dict, Optional
-from pydantic import BaseModel, Field, conint, confloat
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List, Dict, Literal, Optional
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, conint, confloat
+
+try:
+    from .config import ASSETS
+except ImportError:
+    from config import ASSETS
+
+# Shared by every model: immutable after validation (cheap equality/hashing
+# of fields) and unknown fields rejected instead of scanned and dropped
+MODEL_CONFIG = ConfigDict(frozen=True, extra="forbid")
 
 
 # ============================
@@ -12,6 +24,8 @@ from pydantic import BaseModel, Field, conint, confloat
 # ============================
 class LumpEvent(BaseModel):
     """One-time lump sum event (inheritance, home sale, etc.)"""
+    model_config = MODEL_CONFIG
+    
     age: int
     amount: float
     description: str = ""
@@ -19,6 +33,8 @@ class LumpEvent(BaseModel):
 
 class ToyPurchase(BaseModel):
     """Major purchase event (car, vacation, etc.)"""
+    model_config = MODEL_CONFIG
+    
     age: int
     amount: float
     description: str
@@ -29,6 +45,8 @@ class ToyPurchase(BaseModel):
 # ============================
 class IncomeStream(BaseModel):
     """Recurring income stream (Social Security, pension, etc.)"""
+    model_config = MODEL_CONFIG
+    
     start_age: int
     end_age: int
     monthly: float
@@ -37,6 +55,8 @@ class IncomeStream(BaseModel):
 
 class ConsultingLadder(BaseModel):
     """Post-retirement consulting income that tapers off"""
+    model_config = MODEL_CONFIG
+    
     start_age: int = 55
     years: conint(ge=0, le=20) = 5
     start_amount: float = 25000
@@ -48,6 +68,8 @@ class ConsultingLadder(BaseModel):
 # ============================
 class Account(BaseModel):
     """Investment account with asset allocation"""
+    model_config = MODEL_CONFIG
+    
     kind: str  # "401k", "IRA", "Taxable", "Cash", "Crypto"
     balance: float
     # Allocation by asset class (sum <= 1.0; residual treated as cash)
@@ -60,6 +82,8 @@ class Account(BaseModel):
 
 class BlackSwanEvent(BaseModel):
     """Sudden portfolio drop at a specific age"""
+    model_config = MODEL_CONFIG
+    
     enabled: bool = False
     age: int = 67  # Age when the event occurs
     portfolio_drop: float = 0.25  # Percentage drop (0.25 = 25% drop)
@@ -70,6 +94,7 @@ class BlackSwanEvent(BaseModel):
 # ============================
 class CapitalMarketAssumptions(BaseModel):
     """Expected returns, volatilities, and correlations for asset classes"""
+    model_config = MODEL_CONFIG
     
     # Expected returns and volatilities (nominal, annual)
     exp_ret: Dict[str, float] = Field(
@@ -107,6 +132,17 @@ class CapitalMarketAssumptions(BaseModel):
     t_df: int = 12  # degrees of freedom for Student-t (12=subtle, 8=moderate, 6=strong)
     tail_boost: float = 1.0  # skewness: <1.0 negative, 1.0 neutral, >1.0 positive
     tail_prob: float = 0.020  # 2.0% = standard frequency (placeholder)
+    
+    # Floating-point precision of the simulated return tensors ("f64" for full double precision)
+    precision: Literal["f32", "f64"] = "f32"
+    
+    @cached_property
+    def corr_matrix(self) -> np.ndarray:
+        """Correlation dict as an (n_assets, n_assets) array ordered as ASSETS."""
+        n = len(ASSETS)
+        return np.fromiter(
+            (self.corr[i][j] for i in ASSETS for j in ASSETS), dtype=float, count=n * n
+        ).reshape(n, n)
 
 
 # ============================
@@ -114,6 +150,8 @@ class CapitalMarketAssumptions(BaseModel):
 # ============================
 class Taxes(BaseModel):
     """Tax configuration for retirement planning"""
+    model_config = MODEL_CONFIG
+    
     effective_rate: float = 0.20  # Applied to taxable withdrawals and income
     taxable_portfolio_ratio: float = 0.75  # Portion of portfolio withdrawals that are taxable
     taxable_income_ratio: float = 0.80  # Portion of income that is taxable
@@ -121,17 +159,35 @@ class Taxes(BaseModel):
 
 class Spending(BaseModel):
     """Annual spending configuration"""
+    model_config = MODEL_CONFIG
+    
     base_annual: float = 100000
     reduced_annual: float = 70000
     reduce_at_age: int = 57
     inflation: float = 0.02  # Annual inflation rate
 
 
+# ============================
+# Array Views
+# ============================
+@dataclass(frozen=True, eq=False)
+class ScenarioArrays:
+    """Scenario inputs packed into NumPy arrays, asset axis ordered as ASSETS"""
+    balances: np.ndarray  # (n_accounts,) account balances
+    allocations: np.ndarray  # (n_accounts, n_assets) raw allocation fractions
+    mu: np.ndarray  # (n_assets,) expected arithmetic returns
+    vols: np.ndarray  # (n_assets,) volatilities
+    corr: np.ndarray  # (n_assets, n_assets) correlation matrix
+    cov: np.ndarray  # (n_assets, n_assets) covariance matrix
+
+
 # ============================
 # Main Scenario Model
 # ============================
 class Scenario(BaseModel):
     """Complete retirement scenario configuration"""
+    model_config = MODEL_CONFIG
+    
     name: str = "Base"
     current_age: int = 55
     end_age: int = 90
@@ -153,6 +209,26 @@ class Scenario(BaseModel):
     
     # Simulation parameters
     sims: conint(ge=500, le=100000) = 10000
+    seed: Optional[int] = None  # Fixed RNG seed for reproducible runs
+    
+    @cached_property
+    def arrays(self) -> ScenarioArrays:
+        """Accounts and market assumptions as arrays, built once per scenario."""
+        cma = self.cma
+        vols = np.array([cma.vol[a] for a in ASSETS])
+        corr = cma.corr_matrix
+        cov = np.multiply.outer(vols, vols)
+        cov *= corr
+        return ScenarioArrays(
+            balances=np.array([acc.balance for acc in self.accounts], dtype=float),
+            allocations=np.array(
+                [[getattr(acc, a) for a in ASSETS] for acc in self.accounts], dtype=float
+            ).reshape(len(self.accounts), len(ASSETS)),
+            mu=np.array([cma.exp_ret[a] for a in ASSETS]),
+            vols=vols,
+            corr=corr,
+            cov=cov,
+        )
 
 
 # ============================
@@ -160,9 +236,19 @@ class Scenario(BaseModel):
 # ============================
 class SimulationResult(BaseModel):
     """Results from a Monte Carlo simulation"""
+    model_config = MODEL_CONFIG
+    
     ages: List[int]
     median: List[float]
     p20: List[float]
     p80: List[float]
     end_balance_percentiles: Dict[str, float]
-    success_prob: float
\ No newline at end of file
+    success_prob: float
+
+
+class ScenarioSummary(BaseModel):
+    """Saved scenario listing entry"""
+    model_config = MODEL_CONFIG
+    
+    id: int
+    name: str
@@ -0,0 +1,37 @@
+"""
+Ahead-of-time build of the simulation kernels into the _mc_aot extension.
+
+    cd src/backend && python -m monte_carlo._aot_build
+
+The extension needs neither Numba nor LLVM at runtime, so a deployment can
+build it once and skip the JIT entirely. AOT code is compiled without
+parallel=True, so kernels.py still prefers the parallel JIT kernels when
+Numba is installed and uses _mc_aot ahead of the NumPy fallback otherwise.
+"""
+
+from pathlib import Path
+
+from numba.pycc import CC
+
+try:
+    from . import kernels
+except ImportError:
+    from monte_carlo import kernels
+
+cc = CC("_mc_aot")
+cc.output_dir = str(Path(__file__).parent)
+
+# One export per growth dtype: AOT signatures are fixed at build time
+_simulate = kernels._simulate_balances_numba.py_func
+cc.export("simulate_balances_f4", "f8[:,:](f8[:,:], f4[:,:], f8[:], f8[:], f8[:])")(_simulate)
+cc.export("simulate_balances_f8", "f8[:,:](f8[:,:], f8[:,:], f8[:], f8[:], f8[:])")(_simulate)
+
+_step = kernels._step_balances_numba.py_func
+cc.export("step_balances_f4", "f8[:](f8[:], f4[:], f8, f8, f8)")(_step)
+cc.export("step_balances_f8", "f8[:](f8[:], f8[:], f8, f8, f8)")(_step)
+
+cc.export("cholesky", "b1(f8[:,:], f8[:,:])")(kernels._cholesky_numba.py_func)
+
+
+if __name__ == "__main__":
+    cc.compile()
@@ -5,8 +5,18 @@ Targets U.S. equity historical data (50-100 years).
 
 import numpy as np
 from typing import Dict, Callable, Optional, Tuple, Any
-from dataclasses import dataclass
-import copy
+from dataclasses import dataclass, replace
+
+try:
+    from .kernels import count_bad_windows
+except ImportError:
+    from monte_carlo.kernels import count_bad_windows
+
+
+# Quantiles reported by compute_distribution_metrics, ascending
+METRIC_QUANTILES = np.array([0.01, 0.05, 0.10, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99])
+# Tail quantiles matched by fit_tail_scales: q01, q05
+TAIL_QUANTILES = np.array([0.01, 0.05])
 
 
 @dataclass
@@ -31,6 +41,20 @@ class HistoricalTargets:
     # by the separate Black Swan feature, not the fat-tail algorithm
 
 
+def _sorted_quantiles(s: np.ndarray, probs: np.ndarray) -> np.ndarray:
+    """Quantiles of an ascending array s, linearly interpolated like np.percentile."""
+    pos = probs * (s.size - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, s.size - 1)
+    return s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+
+def _sorted_shortfall(s: np.ndarray, q: float) -> float:
+    """Mean of the values <= q in an ascending array s (q itself if there are none)."""
+    n = np.searchsorted(s, q, side="right")
+    return np.mean(s[:n]) if n else q
+
+
 def compute_distribution_metrics(returns: np.ndarray) -> Dict[str, float]:
     """
     Compute key distribution metrics for annual returns.
@@ -48,19 +72,14 @@ def compute_distribution_metrics(returns: np.ndarray) -> Dict[str, float]:
     skew = stats.skew(returns)
     excess_kurt = stats.kurtosis(returns)  # Already excess kurtosis in scipy
     
-    q05 = np.percentile(returns, 5)
-    q01 = np.percentile(returns, 1)
-    q10 = np.percentile(returns, 10)
-    q25 = np.percentile(returns, 25)
-    q50 = np.percentile(returns, 50)
-    q75 = np.percentile(returns, 75)
-    q90 = np.percentile(returns, 90)
-    q95 = np.percentile(returns, 95)
-    q99 = np.percentile(returns, 99)
+    # Sort once: every quantile and both shortfalls read off the sorted copy
+    # instead of nine partitions
+    s = np.sort(returns, axis=None)
+    q01, q05, q10, q25, q50, q75, q90, q95, q99 = _sorted_quantiles(s, METRIC_QUANTILES)
     
     # Expected shortfall (conditional value at risk)
-    es05 = np.mean(returns[returns <= q05]) if np.any(returns <= q05) else q05
-    es01 = np.mean(returns[returns <= q01]) if np.any(returns <= q01) else q01
+    es05 = _sorted_shortfall(s, q05)
+    es01 = _sorted_shortfall(s, q01)
     
     return {
         "mean": mean,
@@ -126,6 +145,18 @@ def validate_against_targets(
     return results
 
 
+def _scale_jumps(cfg: Any, scale_mag: float, scale_freq: float) -> Any:
+    """Copy of cfg with market and per-asset jump sizes and intensities scaled."""
+    def scaled(p):
+        return replace(p, eta_neg=p.eta_neg * scale_mag, eta_pos=p.eta_pos * scale_mag,
+                       lam=p.lam * scale_freq)
+    return replace(
+        cfg,
+        market=scaled(cfg.market),
+        per_asset={name: scaled(p) for name, p in cfg.per_asset.items()},
+    )
+
+
 def fit_tail_scales(
     sim_fn: Callable,
     base_cfg: Any,
@@ -151,35 +182,24 @@ def fit_tail_scales(
     rng = np.random.default_rng(42)
     best = {"error": float('inf'), "scale_mag": 1.0, "scale_freq": 1.0}
     
-    for _ in range(tries):
-        # Explore scaling factors
-        scale_mag = rng.uniform(0.9, 1.3)
-        scale_freq = rng.uniform(0.9, 1.5)
-        
-        # Apply scales to config
-        cfg = copy.deepcopy(base_cfg)
-        
-        # Scale market jumps
-        cfg.market.eta_neg *= scale_mag
-        cfg.market.eta_pos *= scale_mag
-        cfg.market.lam *= scale_freq
-        
-        # Scale per-asset jumps
-        for asset_params in cfg.per_asset.values():
-            asset_params.eta_neg *= scale_mag
-            asset_params.eta_pos *= scale_mag
-            asset_params.lam *= scale_freq
+    # Explore scaling factors: (scale_mag, scale_freq) per try, same stream
+    # as drawing the pair one try at a time
+    scales = rng.uniform((0.9, 0.9), (1.3, 1.5), size=(tries, 2))
+    
+    for scale_mag, scale_freq in scales.tolist():
+        # Apply scales to config: only the jump params are rebuilt (through
+        # __init__, not deepcopy); everything else is shared with base_cfg
+        cfg = _scale_jumps(base_cfg, scale_mag, scale_freq)
         
         # Run simulation for one year
         returns = sim_fn(cfg, n_years=1, n_sims=sims)
         
-        # Extract stock returns
-        stock_returns = returns[0, :, assets_idx]
+        # Extract stock returns, sorted once for both quantiles and the shortfall
+        stock_returns = np.sort(returns[0, :, assets_idx])
         
         # Compute metrics
-        q05 = np.percentile(stock_returns, 5)
-        q01 = np.percentile(stock_returns, 1)
-        es05 = np.mean(stock_returns[stock_returns <= q05]) if np.any(stock_returns <= q05) else q05
+        q01, q05 = _sorted_quantiles(stock_returns, TAIL_QUANTILES)
+        es05 = _sorted_shortfall(stock_returns, q05)
         
         # Compute error
         error = 0
@@ -225,13 +245,8 @@ def compute_sequence_risk(
     n_sims = returns.shape[1]
     n_windows = returns.shape[0] - years + 1
     
-    # Calculate rolling N-year cumulative returns
-    bad_sequences = 0
-    for start in range(n_windows):
-        window = returns[start:start + years, :]
-        # Cumulative return: (1+r1)*(1+r2)*...*(1+rN) - 1
-        cum_returns = np.prod(1 + window, axis=0) - 1
-        bad_sequences += np.sum(cum_returns <= threshold)
+    # Rolling N-year cumulative returns: (1+r1)*(1+r2)*...*(1+rN) - 1
+    bad_sequences = count_bad_windows(returns, years, threshold)
     
     return bad_sequences / (n_windows * n_sims)
 
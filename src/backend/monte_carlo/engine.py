@@ -2,26 +2,146 @@
 Core Monte Carlo simulation engine for retirement planning.
 """
 
-from typing import Dict, Any, Optional
+import threading
+from functools import cached_property, lru_cache
+from typing import Dict, Any, Optional, Tuple
 import numpy as np
 
 try:
     # Try relative imports (when running as module)
     from ..models import Scenario
-    from ..config import ASSETS, DEFAULT_FAT_TAIL_ENGINE
+    from ..config import ASSETS, DEFAULT_FAT_TAIL_ENGINE, ANTITHETIC_VARIATES
+    from .kernels import (
+        add_per_asset, cholesky, clip_bounds, clip_per_asset, correlate, mean_per_asset,
+        scatter_add_per_asset, simulate_balances, step_balances, use_gpu,
+    )
 except ImportError:
     # Fall back to absolute imports
     import sys
     from pathlib import Path
     sys.path.append(str(Path(__file__).parent.parent))
     from models import Scenario
-    from config import ASSETS, DEFAULT_FAT_TAIL_ENGINE
+    from config import ASSETS, DEFAULT_FAT_TAIL_ENGINE, ANTITHETIC_VARIATES
+    from monte_carlo.kernels import (
+        add_per_asset, cholesky, clip_bounds, clip_per_asset, correlate, mean_per_asset,
+        scatter_add_per_asset, simulate_balances, step_balances, use_gpu,
+    )
+
+
+# Stress-event sensitivity per asset (assets not listed are unaffected)
+_STRESS_BETA = {"stocks": 1.0, "crypto": 1.5, "bonds": -0.2}
+
+# The 'current' engine caps standard-magnitude stock gains at +80% rather
+# than the shared +100% (extreme magnitude keeps the shared bounds)
+_CLIP_OVERRIDES = (("stocks", (-0.60, 0.80)),)
+
+# Eigenvalue floor when projecting a near-PSD covariance before Cholesky
+_MIN_EIGENVALUE = 1e-12
+
+# Percentiles reported per year: p20, median, p80
+SUMMARY_QUANTILES = (0.2, 0.5, 0.8)
+
+
+# Per-thread scratch arrays reused across Engine instances (one Engine per request)
+_SCRATCH = threading.local()
+
+# Largest scratch buffer kept per thread and name. Covers the default 10k-sim
+# runs (~26 MB of float64 shocks over 65 years); bigger requests allocate
+# fresh arrays that are freed with the request, so one max-size run can't
+# leave hundreds of MB resident in every worker thread and process
+_SCRATCH_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _scratch(name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """
+    Uninitialized scratch array of the given shape, reused across calls.
+    
+    Each thread keeps one flat buffer per (name, dtype), grown to the largest
+    size requested so far up to _SCRATCH_MAX_BYTES, so repeat requests skip
+    the allocation and page faults. The result must not outlive the call
+    that asked for it.
+    """
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    if size * dtype.itemsize > _SCRATCH_MAX_BYTES:
+        return np.empty(shape, dtype=dtype)
+    key = (name, dtype)
+    buf = _SCRATCH.__dict__.get(key)
+    if buf is None or buf.size < size:
+        buf = _SCRATCH.__dict__[key] = np.empty(size, dtype=dtype)
+    return buf[:size].reshape(shape)
+
+
+def _read_only(*arrays: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Mark cached arrays read-only so callers cannot corrupt the cache."""
+    for a in arrays:
+        a.flags.writeable = False
+    return arrays
+
+
+@lru_cache(maxsize=64)
+def _cov_factors(cov_rows: Tuple[Tuple[float, ...], ...]) -> Tuple[np.ndarray, ...]:
+    """
+    Covariance, Cholesky factor and its float32 copy for one set of CMAs.
+    
+    User-edited correlations are often PSD only up to rounding; those are
+    projected onto the nearest PSD matrix by clipping eigenvalues at
+    _MIN_EIGENVALUE rather than rejected.
+    """
+    cov = np.array(cov_rows)
+    try:
+        chol = cholesky(cov)
+    except np.linalg.LinAlgError:
+        w, V = np.linalg.eigh(cov)
+        cov = (V * np.maximum(w, _MIN_EIGENVALUE)) @ V.T
+        chol = cholesky(cov)
+    return _read_only(cov, chol, chol.astype(np.float32))
+
+
+@lru_cache(maxsize=64)
+def _portfolio_weights(balances: Tuple[float, ...], allocations: Tuple[float, ...]) -> np.ndarray:
+    """Balance-weighted portfolio asset weights for one set of accounts."""
+    balances_arr = np.array(balances)
+    if balances_arr.sum() <= 0:
+        raise ValueError("Total account balance must be > 0")
+    weights_by_acc = balances_arr / balances_arr.sum()
+    
+    # Normalize each account's allocation; unspecified accounts default to cash
+    W = np.array(allocations).reshape(len(balances), -1)
+    W[W.sum(axis=1) == 0, -1] = 1.0
+    W /= W.sum(axis=1, keepdims=True)
+    
+    # Overall portfolio asset weights
+    return _read_only(weights_by_acc @ W)[0]
+
+
+def _quantile_positions(n: int, probs) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Order-statistic indices (lo, hi) and interpolation weights for np.quantile's linear rule."""
+    pos = np.asarray(probs) * (n - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    return lo, hi, pos - lo
+
+
+def _select_quantiles(values: np.ndarray, probs) -> np.ndarray:
+    """
+    Linear-interpolated quantiles along axis 1, matching np.quantile.
+    
+    Sorts values in place: NumPy's SIMD float sort beats a partition around
+    the six order statistics (~4x for 46 x 10k). Returns shape
+    (len(probs), n_rows).
+    """
+    lo, hi, frac = _quantile_positions(values.shape[1], probs)
+    values.sort(axis=1)
+    v_lo, v_hi = values[:, lo], values[:, hi]
+    return (v_lo + (v_hi - v_lo) * frac).T
 
 
 class Engine:
     """Monte Carlo simulation engine for retirement scenarios."""
     
-    def __init__(self, scenario: Scenario, fat_tail_engine: Optional[str] = None):
+    def __init__(self, scenario: Scenario, fat_tail_engine: Optional[str] = None,
+                 stream: int = 0, fat_tail_cfg: Optional[Any] = None):
         """
         Initialize the Monte Carlo engine.
         
@@ -29,19 +149,51 @@ class Engine:
             scenario: The retirement scenario to simulate
             fat_tail_engine: Which fat-tail implementation to use 
                            ("kou_logsafe", "research", or "current")
+            stream: Index of a non-overlapping substream of the scenario
+                    seed, for chunks of one run split across workers
+                    (stream 0 is default_rng(seed) itself)
+            fat_tail_cfg: Kou FatTailCfg used as-is instead of the one
+                          built from the scenario CMAs (tests, calibration)
         """
         self.sc = scenario
         self.horizon = scenario.end_age - scenario.current_age
         self.fat_tail_engine = fat_tail_engine or DEFAULT_FAT_TAIL_ENGINE
+        self._fat_tail_cfg = fat_tail_cfg
+        self._rng = np.random.Generator(np.random.PCG64(scenario.seed).jumped(stream))
         self._prep_cov()
 
     def _prep_cov(self):
-        """Build covariance matrix from volatilities and correlations."""
-        vols = np.array([self.sc.cma.vol[a] for a in ASSETS])
-        corr = np.array([[self.sc.cma.corr[i][j] for j in ASSETS] for i in ASSETS])
-        self.cov = np.outer(vols, vols) * corr
-        self.chol = np.linalg.cholesky(self.cov)
-        self.mu = np.array([self.sc.cma.exp_ret[a] for a in ASSETS])
+        """Look up covariance, Cholesky factor and means for the scenario CMAs."""
+        arrays = self.sc.arrays
+        # Cached across Engine instances: CMAs rarely change between requests
+        self.cov, self.chol, self._chol32 = _cov_factors(tuple(map(tuple, arrays.cov.tolist())))
+        self.mu = arrays.mu
+        # Return tensors are float32 unless the CMAs ask for "f64" (half the
+        # memory traffic); the balance recurrence always runs in float64
+        f32 = self.sc.cma.precision == "f32"
+        self.dtype = np.float32 if f32 else np.float64
+        self._chol_draw = self._chol32 if f32 else self.chol
+        self._mu_draw = self.mu.astype(self.dtype)
+
+    def _standard_shocks(self, n_years: int, n_sims: int) -> np.ndarray:
+        """
+        Standard normal shocks of shape (n_years, n_sims, n_assets) in self.dtype.
+        
+        With ANTITHETIC_VARIATES the second half of the sims mirrors the
+        first (-z), halving RNG work and reducing variance of the estimates.
+        """
+        z = _scratch("shocks", (n_years, n_sims, len(ASSETS)), self.dtype)
+        if not ANTITHETIC_VARIATES:
+            return self._rng.standard_normal(dtype=self.dtype, out=z)
+        
+        # Generator output must be contiguous, so draw the half separately
+        half = n_sims // 2
+        size = (n_years, n_sims - half, len(ASSETS))
+        drawn = self._rng.standard_normal(dtype=self.dtype,
+                                          out=_scratch("half_shocks", size, self.dtype))
+        z[:, :n_sims - half] = drawn
+        np.negative(drawn[:, :half], out=z[:, n_sims - half:])
+        return z
 
     def _draw_returns(self, n_years: int, n_sims: int) -> np.ndarray:
         """
@@ -65,12 +217,14 @@ class Engine:
             # Select fat-tail engine
             if self.fat_tail_engine == "kou_logsafe":
                 from .fat_tails_kou_logsafe import draw_fat_tailed_returns_kou_logsafe, FatTailCfg
-                cfg = FatTailCfg(
+                cfg = self._fat_tail_cfg or FatTailCfg(
                     enabled=True,
                     t_df=self.sc.cma.t_df,
                     tail_magnitude=magnitude,
                     tail_frequency=frequency,
-                    tail_skew=skew
+                    tail_skew=skew,
+                    antithetic=ANTITHETIC_VARIATES,
+                    dtype=self.dtype
                 )
                 return draw_fat_tailed_returns_kou_logsafe(
                     mu_arith=self.mu,
@@ -78,7 +232,8 @@ class Engine:
                     assets=ASSETS,
                     n_years=n_years,
                     n_sims=n_sims,
-                    cfg=cfg
+                    cfg=cfg,
+                    rng=self._rng
                 )
             elif self.fat_tail_engine == "research":
                 from .fat_tails_research import draw_fat_tailed_returns, FatTailConfig
@@ -87,7 +242,9 @@ class Engine:
                     t_df=self.sc.cma.t_df,
                     tail_magnitude=magnitude,
                     tail_frequency=frequency,
-                    tail_skew=skew
+                    tail_skew=skew,
+                    seed=self.sc.seed,
+                    dtype=self.dtype
                 )
                 return draw_fat_tailed_returns(
                     mu=self.mu,
@@ -95,7 +252,8 @@ class Engine:
                     assets=ASSETS,
                     n_years=n_years,
                     n_sims=n_sims,
-                    cfg=cfg
+                    cfg=cfg,
+                    rng=self._rng
                 )
             else:  # "current" - use existing implementation
                 return self._draw_fat_tailed_returns_current(
@@ -111,21 +269,41 @@ class Engine:
                 )
         else:
             # Standard normal returns without fat tails
-            z = np.random.normal(size=(n_years, n_sims, len(ASSETS)))
-            z_corr = z @ self.chol.T
-            rets = self.mu + z_corr
+            z = self._standard_shocks(n_years, n_sims)
+            rets = correlate(z, self._chol_draw)
+            rets += self._mu_draw  # in place: the correlated shocks are a fresh array
             return rets
 
+    def _draw_portfolio_returns(self, n_years: int, n_sims: int, port_w: np.ndarray) -> np.ndarray:
+        """
+        Draw portfolio-level returns of shape (n_years, n_sims).
+        
+        Without fat tails the returns are linear in z, so the allocation is
+        folded into the Cholesky factor and the per-asset returns are never
+        built. Fat-tail engines clip per asset, so they still project rets.
+        """
+        if self.sc.cma.fat_tails:
+            rets = self._draw_returns(n_years, n_sims)
+            # Match the weights to the returns' dtype: a mixed float32 x float64
+            # product is upcast element by element and runs ~6x slower. The 3D
+            # matmul already beats a reshape to (n_years * n_sims, n_assets)
+            return rets @ port_w.astype(rets.dtype, copy=False)
+        # The shocks live in a reused scratch buffer; the projection is the
+        # only allocation and the drift is added to it in place
+        z = self._standard_shocks(n_years, n_sims)
+        rets = z @ (self._chol_draw.T @ port_w.astype(self.dtype))
+        rets += self.dtype(self.mu @ port_w)
+        return rets
+
     def _draw_fat_tailed_returns_current(self, mu, chol, assets, n_years, n_sims, 
                                          t_df, tail_magnitude, tail_frequency, tail_skew):
         """Current implementation (kept for comparison)."""
-        rng = np.random.default_rng(None)
-        A = len(assets)
+        rng = self._rng
         
-        # Generate base returns using normal distribution
-        z = rng.standard_normal(size=(n_years, n_sims, A))
-        z_corr = z @ chol.T
-        rets = mu.reshape(1, 1, A) + z_corr
+        # Generate base returns using normal distribution; the tails come
+        # from the stress events below
+        z = self._standard_shocks(n_years, n_sims)
+        rets = add_per_asset(correlate(z, chol), mu)
         
         # Add calibrated market stress events
         if tail_frequency == "standard":
@@ -138,8 +316,12 @@ class Engine:
         else:
             stress_base = 0.04
         
-        stress_events = rng.random((n_years, n_sims)) < stress_prob
-        n_stress = int(stress_events.sum())
+        # Bernoulli(stress_prob) per (year, sim), drawn as a Binomial count
+        # and a uniform subset of flat positions: same distribution, but only
+        # the ~10% of cells that get an event are drawn or written
+        total = n_years * n_sims
+        n_stress = int(rng.binomial(total, stress_prob))
+        stress_idx = rng.choice(total, size=n_stress, replace=False)
         
         if n_stress > 0:
             if tail_skew == "negative":
@@ -154,89 +336,183 @@ class Engine:
             stress_magnitudes = np.clip(stress_magnitudes, 0.02, 0.05)
             stress_sizes = np.where(stress_directions, stress_magnitudes, -stress_magnitudes)
             
-            stress_adjustments = np.zeros((n_years, n_sims))
-            stress_adjustments[stress_events] = stress_sizes
-            
-            for i, asset in enumerate(assets):
-                if asset == "stocks":
-                    rets[:, :, i] += stress_adjustments
-                elif asset == "crypto":
-                    rets[:, :, i] += 1.5 * stress_adjustments
-                elif asset == "bonds":
-                    rets[:, :, i] -= 0.2 * stress_adjustments
+            # Stocks take the full shock, crypto 1.5x, bonds move against it;
+            # only the stressed cells of nonzero-beta assets are written
+            betas = [_STRESS_BETA.get(a, 0.0) for a in assets]
+            scatter_add_per_asset(rets, stress_idx, stress_sizes, betas)
         
         # Mean correction
         if n_stress > 0:
-            for i, asset in enumerate(assets):
-                actual_mean = np.mean(rets[:, :, i])
-                target_mean = mu[i]
-                drift_correction = (target_mean - actual_mean) * 0.5
-                rets[:, :, i] += drift_correction
+            add_per_asset(rets, (mu - mean_per_asset(rets)) * 0.5)
         
         # Apply realistic bounds
-        for i, asset in enumerate(assets):
-            if asset == "crypto":
-                rets[:, :, i] = np.clip(rets[:, :, i], -0.85, 3.00)
-            elif asset == "stocks":
-                if tail_magnitude == "extreme":
-                    rets[:, :, i] = np.clip(rets[:, :, i], -0.70, 1.00)
-                else:
-                    rets[:, :, i] = np.clip(rets[:, :, i], -0.60, 0.80)
-            elif asset == "bonds":
-                rets[:, :, i] = np.clip(rets[:, :, i], -0.25, 0.35)
-            elif asset == "cds":
-                rets[:, :, i] = np.clip(rets[:, :, i], -0.05, 0.10)
-            else:  # cash
-                rets[:, :, i] = np.clip(rets[:, :, i], -0.02, 0.08)
+        extreme = tail_magnitude == "extreme"
+        clip_lo, clip_hi = clip_bounds(tuple(assets), extreme,
+                                       () if extreme else _CLIP_OVERRIDES, np.float32)
+        clip_per_asset(rets, clip_lo, clip_hi)
         
         return rets
 
     def _account_allocation_vector(self) -> np.ndarray:
         """Calculate weighted allocation across all accounts by balance."""
-        balances = np.array([acc.balance for acc in self.sc.accounts], dtype=float)
-        if balances.sum() <= 0:
-            raise ValueError("Total account balance must be > 0")
-        weights_by_acc = balances / balances.sum()
-        
-        # Map each account to assets
-        W = np.zeros((len(self.sc.accounts), len(ASSETS)))
-        for i, acc in enumerate(self.sc.accounts):
-            alloc = np.array([acc.stocks, acc.bonds, acc.crypto, acc.cds, acc.cash], dtype=float)
-            if alloc.sum() == 0:
-                alloc[-1] = 1.0  # default to cash if unspecified
-            W[i] = alloc / alloc.sum()
-        
-        # Overall portfolio asset weights
-        port_w = (weights_by_acc[:, None] * W).sum(axis=0)
-        return port_w
-
-    def _year_income(self, age: int) -> float:
-        """Calculate total income for a given age."""
-        inc = 0.0
+        arrays = self.sc.arrays
+        return _portfolio_weights(
+            tuple(arrays.balances.tolist()), tuple(arrays.allocations.ravel().tolist())
+        )
+
+    @staticmethod
+    def _add_stream(inc: np.ndarray, ages: np.ndarray, start_age: int, end_age: int,
+                    amount: float, growth: float) -> None:
+        """Add amount * (1 + growth) ** (age - start_age) over start_age..end_age, in place."""
+        first = int(ages[0])
+        lo = max(start_age - first, 0)
+        hi = min(end_age - first + 1, len(ages))
+        if lo < hi:
+            inc[lo:hi] += amount * (1 + growth) ** (ages[lo:hi] - start_age)
+
+    def _year_income(self, ages: np.ndarray) -> np.ndarray:
+        """Calculate total income for each age."""
+        # Each stream only touches the slice of years it is active in
+        inc = np.zeros(len(ages))
         
         # Consulting income
-        if self.sc.consulting.start_age <= age < self.sc.consulting.start_age + self.sc.consulting.years:
-            k = age - self.sc.consulting.start_age
-            inc += self.sc.consulting.start_amount * ((1 + self.sc.consulting.growth) ** k)
+        c = self.sc.consulting
+        self._add_stream(inc, ages, c.start_age, c.start_age + c.years - 1, c.start_amount, c.growth)
         
         # Retirement income streams
         for s in self.sc.incomes:
-            if s.start_age <= age <= s.end_age:
-                years_since = age - s.start_age
-                amt = s.monthly * 12.0 * ((1 + s.cola) ** years_since)
-                inc += amt
+            self._add_stream(inc, ages, s.start_age, s.end_age, s.monthly * 12.0, s.cola)
         
         return inc
 
-    def _year_spend(self, age: int, year0_spend_state: Dict[str, float]) -> float:
-        """Calculate spending for a given age."""
-        base = self.sc.spending.base_annual
-        if age >= self.sc.spending.reduce_at_age:
-            base = self.sc.spending.reduced_annual
+    def _year_spend(self, ages: np.ndarray) -> np.ndarray:
+        """Calculate spending for each age."""
+        sp = self.sc.spending
+        base = np.where(ages >= sp.reduce_at_age, sp.reduced_annual, sp.base_annual)
         
         # Inflate from scenario start
-        years = age - self.sc.current_age
-        return base * ((1 + self.sc.spending.inflation) ** years)
+        return base * (1 + sp.inflation) ** (ages - self.sc.current_age)
+
+    def _sum_by_year(self, ages, amounts) -> np.ndarray:
+        """Sum amounts into a length-nY array by age; ages outside the horizon are dropped."""
+        nY = self.horizon + 1
+        idx = np.asarray(ages, dtype=np.intp) - self.sc.current_age
+        keep = (idx >= 0) & (idx < nY)
+        out = np.zeros(nY)
+        np.add.at(out, idx[keep], np.asarray(amounts, dtype=float)[keep])
+        return out
+
+    def _precompute_year_tables(self) -> Dict[str, np.ndarray]:
+        """
+        Per-year scalars for the balance recurrence, as length-nY arrays.
+        
+        Index yi is the year ending at age current_age + yi (index 0 is unused).
+        """
+        nY = self.horizon + 1
+        taxes = self.sc.taxes
+        ages = np.arange(self.sc.current_age, self.sc.end_age + 1, dtype=float)
+        
+        income = self._year_income(ages)
+        spend = self._year_spend(ages)
+        
+        # Taxes
+        taxable_income = income * taxes.taxable_income_ratio
+        tax_on_income = taxable_income * taxes.effective_rate
+        net_income = np.maximum(income - tax_on_income, 0.0)
+        
+        # Net withdrawal
+        net_wd = np.maximum(spend - net_income, 0.0)
+        taxable_wd = net_wd * taxes.taxable_portfolio_ratio
+        tax_on_wd = taxable_wd * taxes.effective_rate
+        net_wd_after_tax = net_wd + tax_on_wd
+        
+        # Lump sums and toy purchases, summed per age
+        lump = self._sum_by_year([e.age for e in self.sc.lumps], [e.amount for e in self.sc.lumps])
+        toys = self._sum_by_year([t.age for t in self.sc.toys], [t.amount for t in self.sc.toys])
+        
+        # Black Swan multiplier on the start-of-year balance
+        bs_factor = np.ones(nY)
+        if self.sc.black_swan.enabled and 0 <= self.sc.black_swan.age - self.sc.current_age < nY:
+            bs_factor[self.sc.black_swan.age - self.sc.current_age] = 1.0 - self.sc.black_swan.portfolio_drop
+        
+        return {
+            "income": income,
+            "spend": spend,
+            "net_wd_after_tax": net_wd_after_tax,
+            "lump": lump,
+            "toys": toys,
+            "bs_factor": bs_factor,
+        }
+
+    @cached_property
+    def _recurrence_tables(self) -> Tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Initial balance and the per-year (lump, outflow, bs_factor) tables.
+        
+        Deterministic for the scenario, so built once per Engine and shared
+        by repeated run()/simulate() calls. Left writeable: the compiled
+        kernels are specialized for writeable arrays, and nothing mutates them.
+        """
+        tables = self._precompute_year_tables()
+        outflow = tables["toys"] + tables["net_wd_after_tax"]
+        return float(self.sc.arrays.balances.sum()), tables["lump"], outflow, tables["bs_factor"]
+
+    @staticmethod
+    def _to_growth(port_rets: np.ndarray) -> np.ndarray:
+        """
+        Half-year growth factor, applied before and after the mid-year
+        withdrawal; computed in place over the fresh returns array.
+        """
+        growth = np.ascontiguousarray(port_rets)
+        growth *= 0.5
+        growth += 1.0
+        return growth
+
+    def _recurrence_inputs(self, n_sims: int):
+        """Initial balance, half-year growth factors and per-year tables for n_sims paths."""
+        port_w = self._account_allocation_vector()
+
+        # Draw portfolio returns for all years
+        growth = self._to_growth(self._draw_portfolio_returns(self.horizon, n_sims, port_w))
+        init_bal, lump, outflow, bs_factor = self._recurrence_tables
+        return init_bal, growth, lump, outflow, bs_factor
+
+    def _growth_rows(self, n_sims: int):
+        """
+        Yield the half-year growth factors one year at a time, shape (n_sims,).
+        
+        Normal returns are drawn year by year (the same random stream as one
+        full draw), so the working set stays one year of shocks. Fat-tail
+        engines calibrate over the whole tensor and are drawn up front.
+        """
+        port_w = self._account_allocation_vector()
+        if self.sc.cma.fat_tails:
+            yield from self._to_growth(self._draw_portfolio_returns(self.horizon, n_sims, port_w))
+            return
+        for _ in range(self.horizon):
+            yield self._to_growth(self._draw_portfolio_returns(1, n_sims, port_w))[0]
+
+    def simulate(self, n_sims: Optional[int] = None) -> np.ndarray:
+        """
+        Simulate portfolio balance paths.
+        
+        Args:
+            n_sims: Number of paths (defaults to the scenario's sims); lets a
+                    caller split one scenario into chunks across workers
+        
+        Returns:
+            Array of shape (n_years + 1, n_sims) with year-end balances
+        """
+        nS = self.sc.sims if n_sims is None else n_sims
+        init_bal, growth, lump, outflow, bs_factor = self._recurrence_inputs(nS)
+        
+        # Every kernel writes rows 1..horizon, so only row 0 needs filling
+        balances = np.empty((self.horizon + 1, nS))
+        balances[0, :] = init_bal
+
+        # Simulate each year (mid-year withdrawal approach): one fused
+        # kernel pass per sim, years inner
+        return simulate_balances(balances, growth, lump, outflow, bs_factor)
 
     def run(self) -> Dict[str, Any]:
         """
@@ -245,73 +521,40 @@ class Engine:
         Returns:
             Dictionary with simulation results including percentiles and success probability
         """
-        nY = self.horizon + 1
         nS = self.sc.sims
-        port_w = self._account_allocation_vector()
+        if use_gpu(nS):
+            return self.summarize(self.simulate())
         
-        # Initial portfolio balance
-        init_bal = sum(acc.balance for acc in self.sc.accounts)
-        balances = np.zeros((nY, nS))
-        balances[0, :] = init_bal
+        # Stream the years: only the current balances row is kept, and its
+        # quantiles are taken as each year completes
+        init_bal, lump, outflow, bs_factor = self._recurrence_tables
+        growth = self._growth_rows(nS)
+        balances = np.full(nS, init_bal)
+        lo, hi, frac = _quantile_positions(nS, SUMMARY_QUANTILES)
+        # Quantiles are read off a copy in the compute dtype: a float32 sort
+        # runs ~1.7x faster than float64 and its rounding (~1e-7 relative)
+        # is far below what the report shows. The balances stay float64
+        row = np.empty(nS, dtype=self.dtype)
+        paths = np.empty((len(SUMMARY_QUANTILES), self.horizon + 1))
+        for yi in range(self.horizon + 1):
+            if yi:
+                step_balances(balances, next(growth), lump[yi], outflow[yi], bs_factor[yi])
+            # A full sort of one row beats a multi-kth partition: NumPy's
+            # float sort is SIMD-vectorized, partition is not (~4x at 10k sims)
+            row[:] = balances
+            row.sort()
+            paths[:, yi] = row[lo] + (row[hi] - row[lo]) * frac
+        return self._summary(paths, balances)
 
-        # Draw returns for all years
-        rets = self._draw_returns(nY - 1, nS)
-        port_rets = (rets @ port_w)
-
-        # Build lump sums and toys by age
-        lump_by_age = {e.age: e.amount for e in self.sc.lumps}
-        toys_by_age = {}
-        for t in self.sc.toys:
-            toys_by_age.setdefault(t.age, 0.0)
-            toys_by_age[t.age] += t.amount
-
-        # Simulate each year
-        for yi in range(1, nY):
-            age = self.sc.current_age + yi
-
-            income = self._year_income(age)
-            spend = self._year_spend(age, {})
-
-            # Taxes
-            taxable_income = income * self.sc.taxes.taxable_income_ratio
-            tax_on_income = taxable_income * self.sc.taxes.effective_rate
-            net_income = max(income - tax_on_income, 0.0)
-
-            # Net withdrawal
-            net_wd = max(spend - net_income, 0.0)
-            taxable_wd = net_wd * self.sc.taxes.taxable_portfolio_ratio
-            tax_on_wd = taxable_wd * self.sc.taxes.effective_rate
-            net_wd_after_tax = net_wd + tax_on_wd
-
-            # Apply lump sums
-            lump = lump_by_age.get(age, 0.0)
-            toys = toys_by_age.get(age, 0.0)
-            
-            # Mid-year withdrawal approach
-            start_balance = balances[yi-1, :] + lump
-            
-            # Apply Black Swan event if configured
-            if self.sc.black_swan.enabled and age == self.sc.black_swan.age:
-                start_balance = start_balance * (1.0 - self.sc.black_swan.portfolio_drop)
-            
-            # Apply half year's growth
-            half_year_return = port_rets[yi-1, :] / 2.0
-            mid_year_balance = start_balance * (1.0 + half_year_return)
-            
-            # Apply withdrawals and toy purchases
-            after_withdrawal = mid_year_balance - toys - net_wd_after_tax
-            
-            # Apply remaining half year's growth
-            end_balance = after_withdrawal * (1.0 + half_year_return)
-            
-            # Ensure non-negative balance
-            balances[yi, :] = np.maximum(end_balance, 0.0)
+    def summarize(self, balances: np.ndarray) -> Dict[str, Any]:
+        """Percentile paths and success probability for simulated balances (sorted in place)."""
+        # One sort per year serves all three paths
+        return self._summary(_select_quantiles(balances, SUMMARY_QUANTILES), balances[-1, :])
 
-        # Calculate summary statistics
-        median_path = np.median(balances, axis=1)
-        p20_path = np.percentile(balances, 20, axis=1)
-        p80_path = np.percentile(balances, 80, axis=1)
-        end_balances = balances[-1, :]
+    def _summary(self, paths: np.ndarray, end_balances: np.ndarray) -> Dict[str, Any]:
+        """Build the result dict from (p20, median, p80) paths and final balances."""
+        # The last year of each path doubles as the end-balance percentiles
+        p20_path, median_path, p80_path = paths
         
         summary = {
             "ages": list(range(self.sc.current_age, self.sc.end_age + 1)),
@@ -319,11 +562,11 @@ class Engine:
             "p20": p20_path.tolist(),
             "p80": p80_path.tolist(),
             "end_balance_percentiles": {
-                "p20": float(np.percentile(end_balances, 20)),
-                "p50": float(np.percentile(end_balances, 50)),
-                "p80": float(np.percentile(end_balances, 80)),
+                "p20": float(p20_path[-1]),
+                "p50": float(median_path[-1]),
+                "p80": float(p80_path[-1]),
             },
             "success_prob": float((end_balances > 0).mean()),
         }
         
-        return summary
\ No newline at end of file
+        return summary
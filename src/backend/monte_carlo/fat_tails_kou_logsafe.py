@@ -4,10 +4,24 @@ Implements Kou double-exponential jumps in log-space to prevent impossible retur
 Calibrated to achieve 2-5% impact on success rates, matching industry best practices.
 """
 
+import math
 from dataclasses import dataclass, field
-from typing import Dict, Sequence, Optional
+from functools import lru_cache
+from typing import Dict, Sequence, Optional, Tuple
 import numpy as np
 
+try:
+    from ..config import GAUSSIAN_T_DF
+    from .kernels import correlate_planar, double_exponential, segment_sums
+except ImportError:
+    from config import GAUSSIAN_T_DF
+    from monte_carlo.kernels import correlate_planar, double_exponential, segment_sums
+
+# Sims simulated per tile. The pipeline's temporaries (float64 t draws, jump
+# uniforms, masks and indices) scale with the tile rather than the run:
+# peak memory at 100k sims drops from ~5x to ~1.2x the returned tensor
+SIM_TILE = 4096
+
 
 # ============================
 # Configuration Classes
@@ -66,6 +80,8 @@ class FatTailCfg:
         "stocks": -0.70, "bonds": -0.25, "crypto": -0.85, "cds": -0.05, "cash": -0.02
     })
     max_idio_jumps_per_year: int = 1
+    antithetic: bool = False  # Mirror the Student-t body shocks (z, -z) across sims
+    dtype: type = np.float64  # float32 halves memory traffic on the return tensor
     seed: Optional[int] = None
 
 
@@ -82,52 +98,114 @@ def _arith_to_log_cov(mu_arith: np.ndarray, cov_arith: np.ndarray) -> np.ndarray
     return cov_arith * S
 
 
-def _t_shocks_log(years: int, sims: int, chol_log: np.ndarray, df: float, rng) -> np.ndarray:
+@lru_cache(maxsize=64)
+def _log_space_factors(mu_arith: Tuple[float, ...],
+                       cov_rows: Tuple[Tuple[float, ...], ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """Log-space means and Cholesky factor for one set of CMAs (cached across calls)."""
+    mu = np.array(mu_arith)
+    cov_log = _arith_to_log_cov(mu, np.array(cov_rows))
+    cov_log.flat[::len(mu) + 1] += 1e-18  # small diagonal jitter for stability
+    chol_log = np.linalg.cholesky(cov_log)
+    mu_log = np.log1p(mu)
+    mu_log.flags.writeable = chol_log.flags.writeable = False
+    return mu_log, chol_log
+
+
+def _jump_arrays(per_asset: Dict[str, KouLog], assets: Sequence[str]) -> Tuple[np.ndarray, ...]:
     """
-    Zero-mean, vol-preserving Student-t shocks in log space, correlated via chol_log.
+    Per-asset jump parameters as arrays aligned to assets: (lam, p_pos, eta_pos, eta_neg).
+    
+    Assets without parameters get lam = 0 (no jumps).
     """
-    YS, A = years * sims, chol_log.shape[0]
-    z = rng.standard_t(df, size=(YS, A))
-    if df > 2:
-        z *= np.sqrt((df - 2.0) / df)  # unit-variance t, then correlate
-    return (z @ chol_log.T).reshape(years, sims, A)
+    params = np.zeros((4, len(assets)))
+    for i, a in enumerate(assets):
+        p = per_asset.get(a)
+        if p is not None:
+            params[:, i] = (p.lam, p.p_pos, p.eta_pos, p.eta_neg)
+    return tuple(params)
+
+
+def _t_shocks_log(years: int, sims: int, chol_log: np.ndarray, df: float, rng,
+                  antithetic: bool = False, dtype=np.float64) -> np.ndarray:
+    """
+    Zero-mean, vol-preserving Student-t shocks in log space, correlated via
+    chol_log, laid out asset-major: shape (assets, years, sims).
+    
+    With antithetic, only the first half of the sims is drawn and correlated;
+    the second half mirrors it (L(-z) = -Lz), halving the RNG work.
+    """
+    A = chol_log.shape[0]
+    half = sims // 2 if antithetic else 0
+    if df >= GAUSSIAN_T_DF:
+        # Effectively normal (and unit variance): ~3x cheaper than standard_t
+        z = rng.standard_normal(size=(years, sims - half, A))
+    else:
+        z = rng.standard_t(df, size=(years, sims - half, A))
+    if 2 < df < GAUSSIAN_T_DF:
+        # Unit-variance t: scale the A x A factor, not every draw, so the
+        # correlation kernel applies it for free (L(cz) = (cL)z)
+        chol_log = chol_log * np.sqrt((df - 2.0) / df)
+    out = correlate_planar(z, chol_log, np.empty((A, years, sims), dtype=dtype))
+    if half:
+        np.negative(out[:, :, :half], out=out[:, :, sims - half:])
+    return out
 
 
 def _jump_sizes_log(n: int, p_pos: float, eta_pos: float, eta_neg: float, rng) -> np.ndarray:
     """Draw jump sizes from double-exponential distribution in log space."""
     if n <= 0:
         return np.empty(0)
+    # One uniform (sign) and one unit exponential (size) per jump
     u = rng.random(n)
-    pos = u < p_pos
-    out = np.empty(n)
-    if pos.any():
-        out[pos] = rng.exponential(scale=max(1e-12, eta_pos), size=pos.sum())
-    if (~pos).any():
-        out[~pos] = -rng.exponential(scale=max(1e-12, eta_neg), size=(~pos).sum())
-    return out
+    return double_exponential(u, rng.standard_exponential(n), p_pos,
+                              max(1e-12, eta_pos), max(1e-12, eta_neg))
 
 
-def _apply_toggles(cfg: FatTailCfg):
-    """Apply UI toggles with calibrated multipliers for realistic impact."""
-    # Calibrated for 2-5% (standard), 4-8% (extreme), 3-6% (high freq) impact
-    mag = 1.30 if cfg.tail_magnitude == "extreme" else 1.00
-    freq = 1.50 if cfg.tail_frequency == "high" else 1.00  # Updated to 1.5x per recommendation
-    
-    # High frequency also needs magnitude boost for market jumps
-    high_freq_mag_boost = 1.10 if cfg.tail_frequency == "high" else 1.00
-    
-    skew = {"negative": -0.05, "neutral": 0.0, "positive": +0.05}[cfg.tail_skew]
-    skew_mag_scale = {"negative": 1.10, "neutral": 1.00, "positive": 0.95}[cfg.tail_skew]
-
-    per_adj = {}
-    for k, p in cfg.per_asset.items():
-        per_adj[k] = KouLog(
-            lam=p.lam * freq,
-            p_pos=float(np.clip(p.p_pos + skew, 0.05, 0.95)),
-            eta_pos=p.eta_pos * mag * (0.95 if cfg.tail_skew == "positive" else 1.0),
-            eta_neg=p.eta_neg * mag * skew_mag_scale
-        )
+def _truncated_poisson(lam: float, cap: int, size: int, rng) -> np.ndarray:
+    """
+    Poisson(lam) counts with all mass above cap collapsed onto cap.
     
+    Same distribution as np.minimum(rng.poisson(lam), cap) from one uniform
+    per draw compared against the cumulative pmf, ~6x faster for small caps.
+    """
+    u = rng.random(size)
+    counts = np.zeros(size, dtype=np.int64)
+    pmf = cdf = math.exp(-lam)
+    for k in range(1, cap + 1):
+        counts += u >= cdf
+        pmf *= lam / k
+        cdf += pmf
+    return counts
+
+
+def _toggle_factors(cfg: FatTailCfg) -> Dict[str, float]:
+    """Calibrated multipliers for the UI toggles."""
+    # Calibrated for 2-5% (standard), 4-8% (extreme), 3-6% (high freq) impact
+    return {
+        "mag": 1.30 if cfg.tail_magnitude == "extreme" else 1.00,
+        "freq": 1.50 if cfg.tail_frequency == "high" else 1.00,  # Updated to 1.5x per recommendation
+        # High frequency also needs magnitude boost for market jumps
+        "high_freq_mag_boost": 1.10 if cfg.tail_frequency == "high" else 1.00,
+        "skew": {"negative": -0.05, "neutral": 0.0, "positive": +0.05}[cfg.tail_skew],
+        "skew_mag_scale": {"negative": 1.10, "neutral": 1.00, "positive": 0.95}[cfg.tail_skew],
+        "pos_skew_scale": 0.95 if cfg.tail_skew == "positive" else 1.0,
+    }
+
+
+def _toggle_jump_arrays(f: Dict[str, float], lam: np.ndarray, p_pos: np.ndarray,
+                        eta_pos: np.ndarray, eta_neg: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Apply toggle factors f to per-asset jump parameter arrays (see _jump_arrays)."""
+    return (
+        lam * f["freq"],
+        np.clip(p_pos + f["skew"], 0.05, 0.95),
+        eta_pos * f["mag"] * f["pos_skew_scale"],
+        eta_neg * f["mag"] * f["skew_mag_scale"],
+    )
+
+
+def _toggle_market(cfg: FatTailCfg, f: Dict[str, float]) -> MarketJumpLog:
+    """Apply toggle factors f (see _toggle_factors) to the market co-jump."""
+    mag, freq, skew = f["mag"], f["freq"], f["skew"]
     mk = cfg.market
     
     # Adjust market eta_neg if Black Swan is active to avoid double-counting
@@ -137,13 +215,26 @@ def _apply_toggles(cfg: FatTailCfg):
     
     market_adj = MarketJumpLog(
         lam=mk.lam * freq,
-        p_pos=float(np.clip(mk.p_pos + skew, 0.05, 0.95)),
-        eta_pos=mk.eta_pos * mag * (0.95 if cfg.tail_skew == "positive" else 1.0),
-        eta_neg=market_eta_neg_base * mag * high_freq_mag_boost * skew_mag_scale,
+        p_pos=min(max(mk.p_pos + skew, 0.05), 0.95),  # scalar clamp; np.clip costs ~3 us
+        eta_pos=mk.eta_pos * mag * f["pos_skew_scale"],
+        eta_neg=market_eta_neg_base * mag * f["high_freq_mag_boost"] * f["skew_mag_scale"],
         affected_assets=tuple(mk.affected_assets),
         bond_beta=mk.bond_beta
     )
-    return per_adj, market_adj
+    return market_adj
+
+
+def _apply_toggles(cfg: FatTailCfg):
+    """Apply UI toggles with calibrated multipliers for realistic impact."""
+    f = _toggle_factors(cfg)
+    names = list(cfg.per_asset)
+    lam, p_pos, eta_pos, eta_neg = _toggle_jump_arrays(f, *_jump_arrays(cfg.per_asset, names))
+    per_adj = {
+        k: KouLog(lam=float(lam[i]), p_pos=float(p_pos[i]),
+                  eta_pos=float(eta_pos[i]), eta_neg=float(eta_neg[i]))
+        for i, k in enumerate(names)
+    }
+    return per_adj, _toggle_market(cfg, f)
 
 
 # ============================
@@ -156,7 +247,8 @@ def draw_fat_tailed_returns_kou_logsafe(
     n_years: int,
     n_sims: int,
     cfg: FatTailCfg,
-    mean_correct_pilot: int = 40_000
+    mean_correct_pilot: int = 40_000,
+    rng: Optional[np.random.Generator] = None
 ) -> np.ndarray:
     """
     Returns (years, sims, assets) in arithmetic space using:
@@ -169,89 +261,109 @@ def draw_fat_tailed_returns_kou_logsafe(
     
     This approach prevents impossible returns (<-100%) and provides
     realistic fat-tail behavior with 2-5% impact on success rates.
+    
+    Draws from rng when given (e.g. a generator reused across runs),
+    otherwise from a fresh generator seeded with cfg.seed.
     """
-    rng = np.random.default_rng(cfg.seed)
+    if rng is None:
+        rng = np.random.default_rng(cfg.seed)
     assets = list(assets)
     A = len(assets)
 
-    # Convert to log-space covariance
-    cov_log = _arith_to_log_cov(mu_arith, cov_arith)
-    chol_log = np.linalg.cholesky(cov_log + 1e-18 * np.eye(A))  # small jitter for stability
+    # Log-space means and covariance factor, shared by runs with the same CMAs
+    mu_log, chol_log = _log_space_factors(
+        tuple(np.asarray(mu_arith).tolist()), tuple(map(tuple, np.asarray(cov_arith).tolist()))
+    )
 
     df = cfg.t_df if cfg.enabled else 1e9
-    mu_log = np.log1p(mu_arith).reshape(1, 1, A)
+    mu_log = mu_log.reshape(A, 1, 1).astype(cfg.dtype)
 
-    per_adj, market_adj = _apply_toggles(cfg)
+    # Toggled jump parameters: per-asset as arrays aligned to assets (no
+    # per-asset KouLog objects), plus the adjusted market co-jump
+    factors = _toggle_factors(cfg)
+    market_adj = _toggle_market(cfg, factors)
+    jump_lam, jump_p_pos, jump_eta_pos, jump_eta_neg = _toggle_jump_arrays(
+        factors, *_jump_arrays(cfg.per_asset, assets)
+    )
     idx = {a: i for i, a in enumerate(assets)}
+    
+    # Per-asset floors; use extreme floors if extreme magnitude is selected
+    floors_to_use = cfg.extreme_floors if cfg.tail_magnitude == "extreme" else cfg.floors
+    floors = np.array([floors_to_use.get(a, -0.90) for a in assets])
     aff_idx = [idx[a] for a in market_adj.affected_assets if a in idx]
     bonds_i = idx.get("bonds")
 
     def _simulate_block(Y, S, mu_log_local, year_offset=0):
-        """Simulate returns for Y years and S scenarios."""
-        body = _t_shocks_log(Y, S, chol_log, df, rng)
-        logr = mu_log_local + body
+        """
+        Simulate returns for Y years and S scenarios, shape (A, Y, S).
+        
+        Asset-major so the per-asset jump adds and floors below run over
+        contiguous (Y, S) planes rather than every A-th element.
+        """
+        logr = _t_shocks_log(Y, S, chol_log, df, rng, cfg.antithetic, cfg.dtype)
+        YS = Y * S
+        logr += mu_log_local
 
         # Market co-jump: at most 1 per year (Bernoulli)
         if market_adj.lam > 0:
-            # Apply sequence risk boost for early retirement years
-            lam_effective = market_adj.lam
+            # Sequence risk boost for early retirement years
+            year_lam = np.full(Y, market_adj.lam)
             if cfg.sequence_risk_boost > 1.0:
-                for y in range(Y):
-                    if year_offset + y < cfg.early_retirement_years:
-                        # Use year-specific boosted lambda
-                        pass  # Will handle per-year below
+                early = year_offset + np.arange(Y) < cfg.early_retirement_years
+                year_lam[early] = np.minimum(year_lam[early] * cfg.sequence_risk_boost, 0.35)  # Cap at reasonable level
+            p_event = 1.0 - np.exp(-year_lam)
             
-            # Generate market jumps with potential sequence risk adjustment
-            M = np.zeros((Y, S), dtype=bool)
-            for y in range(Y):
-                year_lam = market_adj.lam
-                if cfg.sequence_risk_boost > 1.0 and (year_offset + y) < cfg.early_retirement_years:
-                    year_lam *= cfg.sequence_risk_boost
-                    year_lam = min(year_lam, 0.35)  # Cap at reasonable level
-                p_event = 1.0 - np.exp(-year_lam)
-                M[y, :] = rng.random(S) < p_event
-            n = int(M.sum())
-            if n > 0:
-                m_sizes = _jump_sizes_log(n, market_adj.p_pos, 
+            # Compare raw 32-bit draws with p * 2**32: half the bytes of uniform
+            # doubles and an integer compare
+            thresh = (p_event * 2.0**32).astype(np.uint64)
+            M = rng.integers(0, 1 << 32, size=(Y, S), dtype=np.uint32) < thresh[:, None]
+            hit = np.flatnonzero(M)  # flat (year, sim) cells with a co-jump
+            if hit.size:
+                m_sizes = _jump_sizes_log(hit.size, market_adj.p_pos, 
                                          market_adj.eta_pos, market_adj.eta_neg, rng)
-                m_full = np.zeros((Y, S))
-                m_full[M] = m_sizes
+                # Only the jump cells are written, not a dense (Y, S) plane
                 for j in aff_idx:
-                    logr[:, :, j] += m_full
+                    logr[j].reshape(YS)[hit] += m_sizes
                 if bonds_i is not None and market_adj.bond_beta:
-                    logr[:, :, bonds_i] += market_adj.bond_beta * m_full
+                    logr[bonds_i].reshape(YS)[hit] += market_adj.bond_beta * m_sizes
 
         # Idiosyncratic jumps: cap to 1/year/asset (keeps tails realistic)
-        YS = Y * S
-        for name, p in per_adj.items():
-            j = idx.get(name)
-            if j is None or p.lam <= 0:
+        for j in np.flatnonzero(jump_lam > 0):
+            if cfg.max_idio_jumps_per_year == 1:
+                # Counts are Bernoulli(1 - e^-lam): add each size straight into
+                # its cell, same uniforms and sizes as _truncated_poisson's path
+                hit = np.flatnonzero(rng.random(YS) >= math.exp(-jump_lam[j]))
+                if hit.size:
+                    sizes = _jump_sizes_log(hit.size, jump_p_pos[j], jump_eta_pos[j],
+                                            jump_eta_neg[j], rng)
+                    logr[j].reshape(YS)[hit] += sizes
                 continue
-            counts = np.minimum(rng.poisson(p.lam, size=YS), cfg.max_idio_jumps_per_year)
+            counts = _truncated_poisson(jump_lam[j], cfg.max_idio_jumps_per_year, YS, rng)
             tot = int(counts.sum())
             if tot == 0:
                 continue
-            sizes = _jump_sizes_log(tot, p.p_pos, p.eta_pos, p.eta_neg, rng)
-            bins = np.bincount(np.repeat(np.arange(YS), counts), 
-                              weights=sizes, minlength=YS)
-            logr[:, :, j] += bins.reshape(Y, S)
+            sizes = _jump_sizes_log(tot, jump_p_pos[j], jump_eta_pos[j], jump_eta_neg[j], rng)
+            logr[j] += segment_sums(counts, sizes).reshape(Y, S)
 
         # Convert to arithmetic and apply floors
-        r = np.expm1(logr)  # exp(log_r) - 1, guarantees r > -1
-        
-        # Use extreme floors if extreme magnitude is selected
-        floors_to_use = cfg.extreme_floors if cfg.tail_magnitude == "extreme" else cfg.floors
-        
-        for k, j in idx.items():
-            floor = floors_to_use.get(k, -0.90)
-            r[:, :, j] = np.maximum(r[:, :, j], floor)
+        r = np.expm1(logr, out=logr)  # exp(log_r) - 1, guarantees r > -1; consumes logr
+        np.maximum(r, floors[:, None, None], out=r)  # all assets in one pass
         return r
 
     # Mean-correction: pilot simulation to ensure E[R] ≈ mu_arith after jumps
     if cfg.enabled and mean_correct_pilot > 0:
         pilot = _simulate_block(1, mean_correct_pilot, mu_log)
-        m_sim = pilot.mean(axis=(0, 1))  # (A,)
+        m_sim = pilot.mean(axis=(1, 2))  # (A,)
         delta = np.log1p(mu_arith) - np.log1p(np.clip(m_sim, -0.95, 5.0))
-        mu_log = mu_log + delta.reshape(1, 1, A)
+        mu_log = (mu_log + delta.reshape(A, 1, 1)).astype(cfg.dtype)
+
+    # Simulate SIM_TILE sims at a time into the asset-major output, so only
+    # one tile's temporaries are alive at once
+    out = np.empty((A, n_years, n_sims), dtype=cfg.dtype)
+    for s0 in range(0, n_sims, SIM_TILE):
+        s1 = min(n_sims, s0 + SIM_TILE)
+        out[:, :, s0:s1] = _simulate_block(n_years, s1 - s0, mu_log, year_offset=0)
 
-    return _simulate_block(n_years, n_sims, mu_log, year_offset=0)
\ No newline at end of file
+    # (years, sims, assets) view of the asset-major block; matmuls against
+    # it run as fast as on an interleaved copy
+    return np.moveaxis(out, 0, -1)
\ No newline at end of file
@@ -3,11 +3,21 @@ Research-based fat-tail engine using Student-t and Kou jumps in arithmetic space
 Based on academic literature for realistic market dynamics.
 """
 
-import copy
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Dict, Sequence, Optional
 import numpy as np
 
+try:
+    from ..config import GAUSSIAN_T_DF
+    from .kernels import (
+        add_per_asset, clip_bounds, clip_per_asset, correlate, double_exponential, segment_sums,
+    )
+except ImportError:
+    from config import GAUSSIAN_T_DF
+    from monte_carlo.kernels import (
+        add_per_asset, clip_bounds, clip_per_asset, correlate, double_exponential, segment_sums,
+    )
+
 
 # ============================
 # Configuration Classes
@@ -51,20 +61,26 @@ class FatTailConfig:
     })
     market: MarketJump = field(default_factory=MarketJump)
     seed: Optional[int] = None
+    dtype: type = np.float64  # float32 halves memory traffic on the return tensor
 
 
 # ============================
 # Helper Functions  
 # ============================
 def _student_t_correlated(years: int, sims: int, n_assets: int, 
-                          chol: np.ndarray, df: float, rng: np.random.Generator) -> np.ndarray:
+                          chol: np.ndarray, df: float, rng: np.random.Generator,
+                          dtype=np.float64) -> np.ndarray:
     """Generate correlated Student-t shocks with variance preservation."""
-    Z = rng.standard_t(df, size=(years * sims, n_assets))
+    if df >= GAUSSIAN_T_DF:
+        # Effectively normal (and unit variance): ~3x cheaper than standard_t
+        Z = rng.standard_normal(size=(years * sims, n_assets))
+    else:
+        Z = rng.standard_t(df, size=(years * sims, n_assets))
     # Scale shocks to preserve target covariance: Var(t) = df/(df-2)
-    if df > 2.0:
+    if 2.0 < df < GAUSSIAN_T_DF:
         Z *= np.sqrt((df - 2) / df)
-    C = Z @ chol.T
-    return C.reshape(years, sims, n_assets)
+    # Triangular-aware z @ L.T; avoids a dense GEMM on a transposed copy of chol
+    return correlate(Z.astype(dtype, copy=False), chol).reshape(years, sims, n_assets)
 
 
 def _double_exponential_jump(n: int, p_pos: float, eta_pos: float, 
@@ -72,41 +88,31 @@ def _double_exponential_jump(n: int, p_pos: float, eta_pos: float,
     """Draw jump sizes from double-exponential (Laplace) distribution."""
     if n <= 0:
         return np.empty(0, dtype=float)
+    # One uniform (sign) and one unit exponential (size) per jump
     u = rng.random(n)
-    pos = u < p_pos
-    sizes = np.empty(n, dtype=float)
-    if pos.any():
-        sizes[pos] = rng.exponential(scale=max(1e-12, eta_pos), size=pos.sum())
-    if (~pos).any():
-        sizes[~pos] = -rng.exponential(scale=max(1e-12, eta_neg), size=(~pos).sum())
-    return sizes
+    return double_exponential(u, rng.standard_exponential(n), p_pos,
+                              max(1e-12, eta_pos), max(1e-12, eta_neg))
 
 
 def _apply_toggles_to_params(cfg: FatTailConfig) -> FatTailConfig:
     """Apply UI toggles to create adjusted parameters."""
-    # Create a deep copy to avoid mutating the original
-    new_cfg = copy.deepcopy(cfg)
-
     # Conservative multipliers for realistic impact
-    mag_mult = 1.6 if new_cfg.tail_magnitude == "extreme" else 1.0
-    freq_mult = 2.0 if new_cfg.tail_frequency == "high" else 1.0
-    skew_shift = {"negative": -0.15, "neutral": 0.0, "positive": +0.15}.get(new_cfg.tail_skew, 0.0)
-
-    # Adjust per-asset params
-    for name, p in new_cfg.per_asset.items():
-        p.lam *= freq_mult
-        p.p_pos = float(np.clip(p.p_pos + skew_shift, 0.05, 0.95))
-        p.eta_pos *= mag_mult
-        p.eta_neg *= mag_mult
-
-    # Adjust market jump params
-    m = new_cfg.market
-    m.lam *= freq_mult
-    m.p_pos = float(np.clip(m.p_pos + skew_shift, 0.05, 0.95))
-    m.eta_pos *= mag_mult
-    m.eta_neg *= mag_mult
-    
-    return new_cfg
+    mag_mult = 1.6 if cfg.tail_magnitude == "extreme" else 1.0
+    freq_mult = 2.0 if cfg.tail_frequency == "high" else 1.0
+    skew_shift = {"negative": -0.15, "neutral": 0.0, "positive": +0.15}.get(cfg.tail_skew, 0.0)
+
+    # Fresh jump-parameter objects via dataclasses.replace; cfg itself is
+    # left untouched without a recursive deepcopy of the whole tree
+    def adjusted(p):
+        return replace(p, lam=p.lam * freq_mult,
+                       p_pos=float(np.clip(p.p_pos + skew_shift, 0.05, 0.95)),
+                       eta_pos=p.eta_pos * mag_mult, eta_neg=p.eta_neg * mag_mult)
+
+    return replace(
+        cfg,
+        per_asset={name: adjusted(p) for name, p in cfg.per_asset.items()},
+        market=adjusted(cfg.market),
+    )
 
 
 # ============================
@@ -119,19 +125,24 @@ def draw_fat_tailed_returns(
     n_years: int,
     n_sims: int,
     cfg: FatTailConfig,
+    rng: Optional[np.random.Generator] = None,
 ) -> np.ndarray:
     """
     Generate fat-tailed returns using Student-t body and Kou jumps.
     
+    Draws from rng when given (e.g. the Engine's generator), otherwise from
+    a fresh generator seeded with cfg.seed.
+    
     Returns:
         Array of shape (years, sims, assets) with annual arithmetic returns
     """
-    rng = np.random.default_rng(cfg.seed)
+    if rng is None:
+        rng = np.random.default_rng(cfg.seed)
     A = len(assets)
 
     # 1) Body: correlated Student-t shocks
-    body = _student_t_correlated(n_years, n_sims, A, chol, cfg.t_df, rng)
-    rets = body + mu.reshape(1, 1, A)
+    rets = _student_t_correlated(n_years, n_sims, A, chol, cfg.t_df, rng, cfg.dtype)
+    add_per_asset(rets, mu)
 
     if not cfg.enabled:
         return rets
@@ -150,8 +161,7 @@ def draw_fat_tailed_returns(
         if total_m > 0:
             m_sizes = _double_exponential_jump(total_m, p_cfg.market.p_pos, 
                                               p_cfg.market.eta_pos, p_cfg.market.eta_neg, rng)
-            m_bins = np.bincount(np.repeat(np.arange(YS), m_counts), 
-                               weights=m_sizes, minlength=YS).reshape(n_years, n_sims)
+            m_bins = segment_sums(m_counts, m_sizes).reshape(n_years, n_sims)
             if affected_idx:
                 for j in affected_idx:
                     rets[:, :, j] += m_bins
@@ -168,21 +178,10 @@ def draw_fat_tailed_returns(
         if total == 0:
             continue
         sizes = _double_exponential_jump(total, p.p_pos, p.eta_pos, p.eta_neg, rng)
-        bins = np.bincount(np.repeat(np.arange(YS), counts), weights=sizes, minlength=YS)
-        rets[:, :, j] += bins.reshape(n_years, n_sims)
+        rets[:, :, j] += segment_sums(counts, sizes).reshape(n_years, n_sims)
     
-    # 5) Apply realistic floors to prevent impossible returns
-    for i, asset in enumerate(assets):
-        if asset == "crypto":
-            rets[:, :, i] = np.clip(rets[:, :, i], -0.85, 3.00)
-        elif asset == "stocks":
-            floor = -0.70 if cfg.tail_magnitude == "extreme" else -0.60
-            rets[:, :, i] = np.clip(rets[:, :, i], floor, 1.00)
-        elif asset == "bonds":
-            rets[:, :, i] = np.clip(rets[:, :, i], -0.25, 0.35)
-        elif asset == "cds":
-            rets[:, :, i] = np.clip(rets[:, :, i], -0.05, 0.10)
-        else:  # cash
-            rets[:, :, i] = np.clip(rets[:, :, i], -0.02, 0.08)
+    # 5) Apply realistic floors to prevent impossible returns (one pass)
+    lo, hi = clip_bounds(tuple(assets), cfg.tail_magnitude == "extreme")
+    clip_per_asset(rets, lo, hi)
     
     return rets
\ No newline at end of file
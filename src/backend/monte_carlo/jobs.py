@@ -0,0 +1,35 @@
+"""
+Process-pool entry points for running the engine in worker processes.
+Kept free of app/database imports so spawned workers start quickly.
+"""
+
+import numpy as np
+
+try:
+    from ..models import Scenario
+    from .engine import Engine
+    from .kernels import set_threads
+except ImportError:
+    from models import Scenario
+    from monte_carlo.engine import Engine
+    from monte_carlo.kernels import set_threads
+
+
+def init_worker() -> None:
+    """
+    Pool initializer: one kernel thread per worker process.
+    
+    The pool already runs one worker per physical core, so a worker's
+    parallel kernels fanning out across all cores would oversubscribe them.
+    """
+    set_threads(1)
+
+
+def run_engine_job(scenario_json: bytes) -> dict:
+    """Run the engine on a JSON-serialized Scenario and return the summary."""
+    return Engine(Scenario.model_validate_json(scenario_json)).run()
+
+
+def simulate_chunk_job(scenario_json: bytes, n_sims: int, stream: int = 0) -> np.ndarray:
+    """Simulate n_sims balance paths of a JSON-serialized Scenario on RNG substream stream."""
+    return Engine(Scenario.model_validate_json(scenario_json), stream=stream).simulate(n_sims)
@@ -0,0 +1,541 @@
+"""
+Compiled kernels for the Monte Carlo engine (balance recurrence, small
+matrix factorization). Uses Numba when it is installed, then the
+ahead-of-time _mc_aot extension (see _aot_build.py) if it has been built,
+and NumPy otherwise; large runs go to a CUDA GPU when one is available.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from ..config import CUDA_MIN_SIMS
+except ImportError:
+    from config import CUDA_MIN_SIMS
+
+try:
+    from numba import config as numba_config, njit, prange, set_num_threads
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    from numba import cuda
+    HAS_CUDA = cuda.is_available()
+except Exception:  # numba missing, or no usable driver/toolkit
+    HAS_CUDA = False
+
+try:
+    from . import _mc_aot
+    HAS_AOT = True
+except ImportError:
+    try:
+        from monte_carlo import _mc_aot
+        HAS_AOT = True
+    except ImportError:  # extension not built
+        HAS_AOT = False
+
+CUDA_THREADS_PER_BLOCK = 256
+SEQ_RISK_BLOCK = 512  # sims per parallel block in the sequence-risk kernel
+
+
+# ============================
+# Small Matrix Factorization
+# ============================
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _cholesky_numba(A, L):
+        """Cholesky-Banachiewicz for an n x n (n ~ 5) matrix; False if not positive definite."""
+        n = A.shape[0]
+        for i in range(n):
+            for j in range(i + 1):
+                s = A[i, j]
+                for k in range(j):
+                    s -= L[i, k] * L[j, k]
+                if i == j:
+                    if s <= 0.0:
+                        return False
+                    L[i, i] = np.sqrt(s)
+                else:
+                    L[i, j] = s / L[j, j]
+        return True
+
+    _cholesky_numba(np.eye(1), np.zeros((1, 1)))  # compile at import
+
+
+def cholesky(A: np.ndarray) -> np.ndarray:
+    """
+    Lower Cholesky factor of a small covariance matrix.
+    
+    For the 5x5 asset covariance an inlined loop beats the LAPACK dispatch
+    behind np.linalg.cholesky. Raises np.linalg.LinAlgError like NumPy.
+    """
+    if not (HAS_AOT or HAS_NUMBA):
+        return np.linalg.cholesky(A)
+    kernel = _mc_aot.cholesky if HAS_AOT else _cholesky_numba
+    L = np.zeros_like(A, dtype=np.float64)
+    if not kernel(np.ascontiguousarray(A, dtype=np.float64), L):
+        raise np.linalg.LinAlgError("Matrix is not positive definite")
+    return L
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True, nogil=True)
+    def _correlate5_numba(z, L, out):
+        """out[i] = L @ z[i] for 5 assets, unrolled over the lower triangle."""
+        l00 = L[0, 0]
+        l10, l11 = L[1, 0], L[1, 1]
+        l20, l21, l22 = L[2, 0], L[2, 1], L[2, 2]
+        l30, l31, l32, l33 = L[3, 0], L[3, 1], L[3, 2], L[3, 3]
+        l40, l41, l42, l43, l44 = L[4, 0], L[4, 1], L[4, 2], L[4, 3], L[4, 4]
+        for i in prange(z.shape[0]):
+            z0, z1, z2, z3, z4 = z[i, 0], z[i, 1], z[i, 2], z[i, 3], z[i, 4]
+            out[i, 0] = z0 * l00
+            out[i, 1] = z0 * l10 + z1 * l11
+            out[i, 2] = z0 * l20 + z1 * l21 + z2 * l22
+            out[i, 3] = z0 * l30 + z1 * l31 + z2 * l32 + z3 * l33
+            out[i, 4] = z0 * l40 + z1 * l41 + z2 * l42 + z3 * l43 + z4 * l44
+        return out
+
+    _correlate5_numba(np.zeros((1, 5), dtype=np.float32), np.eye(5, dtype=np.float32),
+                      np.zeros((1, 5), dtype=np.float32))  # compile at import
+
+
+def correlate(z: np.ndarray, L: np.ndarray) -> np.ndarray:
+    """
+    Apply a lower-triangular Cholesky factor to draws: z @ L.T along the last axis.
+    
+    For the 5-asset case the compiled kernel does the 15 multiply-adds of
+    the lower triangle per draw (instead of a 25-term GEMM) and runs ~2.5x
+    faster than the tall-skinny matmul. Result dtype follows z.
+    """
+    L = L.astype(z.dtype, copy=False)
+    if not HAS_NUMBA or z.shape[-1] != 5:
+        return z @ L.T
+    flat = np.ascontiguousarray(z).reshape(-1, 5)
+    out = np.empty_like(flat)
+    _correlate5_numba(flat, np.ascontiguousarray(L), out)
+    return out.reshape(z.shape)
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True, nogil=True)
+    def _correlate5_planar_numba(z, L, out):
+        """out[:, y, s] = L @ z[y, s] for 5 assets, written asset-major."""
+        l00 = L[0, 0]
+        l10, l11 = L[1, 0], L[1, 1]
+        l20, l21, l22 = L[2, 0], L[2, 1], L[2, 2]
+        l30, l31, l32, l33 = L[3, 0], L[3, 1], L[3, 2], L[3, 3]
+        l40, l41, l42, l43, l44 = L[4, 0], L[4, 1], L[4, 2], L[4, 3], L[4, 4]
+        for y in prange(z.shape[0]):
+            for s in range(z.shape[1]):
+                z0, z1, z2, z3, z4 = z[y, s, 0], z[y, s, 1], z[y, s, 2], z[y, s, 3], z[y, s, 4]
+                out[0, y, s] = z0 * l00
+                out[1, y, s] = z0 * l10 + z1 * l11
+                out[2, y, s] = z0 * l20 + z1 * l21 + z2 * l22
+                out[3, y, s] = z0 * l30 + z1 * l31 + z2 * l32 + z3 * l33
+                out[4, y, s] = z0 * l40 + z1 * l41 + z2 * l42 + z3 * l43 + z4 * l44
+        return out
+
+    _correlate5_planar_numba(np.zeros((1, 1, 5), dtype=np.float32), np.eye(5, dtype=np.float32),
+                             np.zeros((5, 1, 1), dtype=np.float32))  # compile at import
+
+
+def correlate_planar(z: np.ndarray, L: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    Like correlate for (years, sims, assets) draws, but written asset-major
+    into the leading sims of out, shape (assets, years, >= sims).
+    
+    Each asset's returns then form contiguous (years, sims) planes for the
+    per-asset passes that follow.
+    """
+    L = L.astype(out.dtype, copy=False)
+    if HAS_NUMBA and z.shape[-1] == 5:
+        _correlate5_planar_numba(np.ascontiguousarray(z, dtype=out.dtype),
+                                 np.ascontiguousarray(L), out)
+    else:
+        out[:, :, :z.shape[1]] = np.moveaxis(z @ L.T, -1, 0)
+    return out
+
+
+# ============================
+# Jump Sampling
+# ============================
+if HAS_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _double_exponential_numba(u, e, p_pos, eta_pos, eta_neg):
+        """Sign and scale each exponential in one pass, in place."""
+        for i in range(e.shape[0]):
+            e[i] = e[i] * eta_pos if u[i] < p_pos else -e[i] * eta_neg
+        return e
+
+    _double_exponential_numba(np.zeros(1), np.zeros(1), 0.5, 1.0, 1.0)
+
+
+def double_exponential(u: np.ndarray, e: np.ndarray, p_pos: float,
+                       eta_pos: float, eta_neg: float) -> np.ndarray:
+    """
+    Turn uniforms u and unit exponentials e into Kou double-exponential jumps.
+    
+    Jump i is +eta_pos * e[i] when u[i] < p_pos, else -eta_neg * e[i];
+    e is overwritten with the result.
+    """
+    if HAS_NUMBA:
+        return _double_exponential_numba(u, e, p_pos, eta_pos, eta_neg)
+    e *= np.where(u < p_pos, eta_pos, -eta_neg)
+    return e
+
+
+# ============================
+# Jump Aggregation
+# ============================
+if HAS_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _segment_sums_numba(counts, values, out):
+        """One pass: bin i accumulates the next counts[i] values in order."""
+        k = 0
+        for i in range(counts.shape[0]):
+            acc = 0.0
+            for _ in range(counts[i]):
+                acc += values[k]
+                k += 1
+            out[i] = acc
+        return out
+
+    _segment_sums_numba(np.zeros(1, dtype=np.int64), np.zeros(0), np.empty(1))
+
+
+def segment_sums(counts: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Sum values into len(counts) bins, bin i owning the next counts[i] values.
+    
+    Same result as np.bincount(np.repeat(np.arange(n), counts), weights=values),
+    which stays as the NumPy fallback; the compiled loop skips the repeated
+    index array and the scattered adds (~1.3x faster for Poisson jump counts).
+    """
+    if not HAS_NUMBA:
+        return np.bincount(np.repeat(np.arange(len(counts)), counts),
+                           weights=values, minlength=len(counts))
+    return _segment_sums_numba(counts, values, np.empty(len(counts)))
+
+
+# ============================
+# Per-Asset Broadcasting
+# ============================
+# Broadcasting an (assets,) vector over (years, sims, assets) runs NumPy's
+# inner loop five elements at a time. On a (years, sims * assets) view with
+# the vector tiled across one row the loops are long and vectorize: ~6x for
+# an add, ~10x for a clip or mean at 45 x 10k x 5
+def _asset_rows(rets: np.ndarray, *vectors):
+    """(years, sims * assets) view of C-contiguous rets, vectors tiled to a row."""
+    rows = rets.reshape(rets.shape[0], -1)
+    reps = rows.shape[1] // rets.shape[-1]
+    return rows, [np.tile(np.asarray(v, dtype=rets.dtype), reps) for v in vectors]
+
+
+def add_per_asset(rets: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """rets += v along the asset (last) axis, in place."""
+    if not rets.flags.c_contiguous:
+        rets += np.asarray(v, dtype=rets.dtype)
+        return rets
+    rows, (v_row,) = _asset_rows(rets, v)
+    rows += v_row
+    return rets
+
+
+def clip_per_asset(rets: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """np.clip(rets, lo, hi, out=rets) for per-asset bounds lo <= hi."""
+    if not rets.flags.c_contiguous:
+        return np.clip(rets, lo, hi, out=rets)
+    rows, (lo_row, hi_row) = _asset_rows(rets, lo, hi)
+    np.maximum(rows, lo_row, out=rows)
+    np.minimum(rows, hi_row, out=rows)
+    return rets
+
+
+# Per-asset return bounds (lo, hi) shared by every engine; unlisted assets
+# use the cash bounds. Engine-specific differences go through overrides
+CLIP_BOUNDS = {
+    "crypto": (-0.85, 3.00),
+    "stocks": (-0.60, 1.00),
+    "bonds": (-0.25, 0.35),
+    "cds": (-0.05, 0.10),
+    "cash": (-0.02, 0.08),
+}
+CLIP_BOUNDS_EXTREME = {**CLIP_BOUNDS, "stocks": (-0.70, 1.00)}
+
+
+@lru_cache(maxsize=16)
+def clip_bounds(assets: Tuple[str, ...], extreme: bool,
+                overrides: Tuple[Tuple[str, Tuple[float, float]], ...] = (),
+                dtype=np.float64) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read-only per-asset (lo, hi) arrays for clip_per_asset, built once per
+    asset list. overrides is a tuple of (asset, (lo, hi)) pairs laid over
+    the standard or extreme table.
+    """
+    bounds = {**(CLIP_BOUNDS_EXTREME if extreme else CLIP_BOUNDS), **dict(overrides)}
+    lo, hi = np.array([bounds.get(a, bounds["cash"]) for a in assets], dtype=dtype).T
+    lo, hi = np.ascontiguousarray(lo), np.ascontiguousarray(hi)
+    lo.flags.writeable = hi.flags.writeable = False
+    return lo, hi
+
+
+def mean_per_asset(rets: np.ndarray) -> np.ndarray:
+    """Mean over years and sims for each asset, accumulated in float64."""
+    A = rets.shape[-1]
+    rows = np.ascontiguousarray(rets).reshape(rets.shape[0], -1)
+    return rows.sum(axis=0, dtype=np.float64).reshape(-1, A).sum(axis=0) / (rets.size // A)
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True, nogil=True)
+    def _scatter_add_numba(flat, idx, sizes, betas):
+        for k in prange(idx.shape[0]):
+            row, x = idx[k], sizes[k]
+            for j in range(betas.shape[0]):
+                if betas[j] != 0:
+                    flat[row, j] += betas[j] * x
+
+
+def scatter_add_per_asset(rets: np.ndarray, idx: np.ndarray, sizes: np.ndarray,
+                          betas: np.ndarray) -> np.ndarray:
+    """
+    rets.reshape(-1, assets)[idx] += sizes[:, None] * betas in place, for
+    distinct flat (year, sim) positions idx. Zero-beta assets are skipped.
+
+    Touches only the selected cells, where the NumPy fallback strides a
+    fancy-indexed column per asset (~5x for 10% of 45 x 10k cells).
+    """
+    flat = rets.reshape(-1, rets.shape[-1])
+    sizes = np.asarray(sizes, dtype=rets.dtype)
+    betas = np.asarray(betas, dtype=rets.dtype)
+    if HAS_NUMBA and rets.flags.c_contiguous:
+        _scatter_add_numba(flat, idx, sizes, betas)
+        return rets
+    for j in np.flatnonzero(betas):
+        flat[idx, j] += betas[j] * sizes
+    return rets
+
+
+# ============================
+# Sequence Risk
+# ============================
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True, nogil=True)
+    def _count_bad_windows_numba(returns, years, threshold):
+        """
+        Blocks of sims in parallel; within a block each window's products
+        accumulate row by row over contiguous sims, so the inner loop
+        vectorizes and no (years, sims) temporaries are built.
+        """
+        n_years, n_sims = returns.shape
+        count = 0
+        for b in prange((n_sims + SEQ_RISK_BLOCK - 1) // SEQ_RISK_BLOCK):
+            lo = b * SEQ_RISK_BLOCK
+            hi = min(lo + SEQ_RISK_BLOCK, n_sims)
+            growth = np.empty(hi - lo)
+            local = 0
+            for start in range(n_years - years + 1):
+                growth[:] = 1.0
+                for y in range(start, start + years):
+                    for s in range(lo, hi):
+                        growth[s - lo] *= 1.0 + returns[y, s]
+                for i in range(hi - lo):
+                    if growth[i] - 1.0 <= threshold:
+                        local += 1
+            count += local
+        return count
+
+    _count_bad_windows_numba(np.zeros((1, 1)), 1, 0.0)
+
+
+def count_bad_windows(returns: np.ndarray, years: int, threshold: float) -> int:
+    """
+    Count the (window, sim) pairs whose compounded return over `years`
+    consecutive rows of returns (n_years, n_sims) is <= threshold.
+    
+    Products are taken directly rather than as sliding log sums, so returns
+    of -100% (log1p = -inf) still count as a total loss.
+    """
+    if HAS_NUMBA:
+        return int(_count_bad_windows_numba(np.ascontiguousarray(returns, dtype=np.float64),
+                                            years, threshold))
+    count = 0
+    for start in range(returns.shape[0] - years + 1):
+        cum_returns = np.prod(1 + returns[start:start + years], axis=0) - 1
+        count += int(np.sum(cum_returns <= threshold))
+    return count
+
+
+# ============================
+# Balance Recurrence
+# ============================
+def _simulate_balances_numpy(balances, growth, lump, outflow, bs_factor):
+    """Year-by-year recurrence, vectorized over the sims axis, built in each output row."""
+    for yi in range(1, balances.shape[0]):
+        g, row = growth[yi-1], balances[yi]
+        np.add(balances[yi-1], lump[yi], out=row)
+        row *= bs_factor[yi]
+        row *= g
+        row -= outflow[yi]
+        row *= g
+        np.maximum(row, 0.0, out=row)
+    return balances
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True, nogil=True)
+    def _simulate_balances_numba(balances, growth, lump, outflow, bs_factor):
+        """Fused recurrence: one pass per sim, sims in parallel, no temporaries."""
+        nY, nS = balances.shape
+        for s in prange(nS):
+            b = balances[0, s]
+            for yi in range(1, nY):
+                g = growth[yi-1, s]
+                b = ((b + lump[yi]) * bs_factor[yi] * g - outflow[yi]) * g
+                b = b if b > 0.0 else 0.0
+                balances[yi, s] = b
+        return balances
+
+    # Compile (or load from the on-disk cache) at import, not on the first
+    # request; growth factors arrive as float32 or float64 by engine
+    for _dtype in (np.float32, np.float64):
+        _simulate_balances_numba(np.ones((2, 1)), np.ones((1, 1), dtype=_dtype),
+                                 np.zeros(2), np.zeros(2), np.ones(2))
+
+
+def _step_balances_numpy(balances, growth, lump, outflow, bs_factor):
+    """One year of the recurrence, in place on a (nS,) balances row."""
+    balances += lump
+    balances *= growth
+    balances *= bs_factor
+    balances -= outflow
+    balances *= growth
+    np.maximum(balances, 0.0, out=balances)
+    return balances
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True, nogil=True)
+    def _step_balances_numba(balances, growth, lump, outflow, bs_factor):
+        """One year of the recurrence, in place, sims in parallel."""
+        for s in prange(balances.shape[0]):
+            g = growth[s]
+            b = ((balances[s] + lump) * bs_factor * g - outflow) * g
+            balances[s] = b if b > 0.0 else 0.0
+        return balances
+
+    for _dtype in (np.float32, np.float64):
+        _step_balances_numba(np.ones(1), np.ones(1, dtype=_dtype), 0.0, 0.0, 1.0)
+
+
+if HAS_CUDA:
+    @cuda.jit
+    def _simulate_balances_cuda(balances, growth, lump, outflow, bs_factor):
+        """One thread per sim; consecutive threads touch consecutive columns."""
+        s = cuda.grid(1)
+        nY, nS = balances.shape
+        if s >= nS:
+            return
+        b = balances[0, s]
+        for yi in range(1, nY):
+            g = growth[yi-1, s]
+            b = ((b + lump[yi]) * bs_factor[yi] * g - outflow[yi]) * g
+            b = b if b > 0.0 else 0.0
+            balances[yi, s] = b
+
+
+def _simulate_balances_gpu(balances, growth, lump, outflow, bs_factor):
+    """Copy inputs to the device, run the CUDA kernel and copy balances back."""
+    d_balances = cuda.to_device(balances)
+    blocks = (balances.shape[1] + CUDA_THREADS_PER_BLOCK - 1) // CUDA_THREADS_PER_BLOCK
+    _simulate_balances_cuda[blocks, CUDA_THREADS_PER_BLOCK](
+        d_balances, cuda.to_device(growth), cuda.to_device(lump),
+        cuda.to_device(outflow), cuda.to_device(bs_factor),
+    )
+    d_balances.copy_to_host(balances)
+    return balances
+
+
+def _simulate_balances_aot(balances, growth, lump, outflow, bs_factor):
+    """Serial AOT recurrence; exports are fixed per growth dtype."""
+    if growth.dtype == np.float32:
+        return _mc_aot.simulate_balances_f4(balances, growth, lump, outflow, bs_factor)
+    return _mc_aot.simulate_balances_f8(balances, growth, lump, outflow, bs_factor)
+
+
+def _step_balances_aot(balances, growth, lump, outflow, bs_factor):
+    """Serial AOT single-year step; exports are fixed per growth dtype."""
+    if growth.dtype == np.float32:
+        return _mc_aot.step_balances_f4(balances, growth, lump, outflow, bs_factor)
+    return _mc_aot.step_balances_f8(balances, growth, lump, outflow, bs_factor)
+
+
+def use_gpu(n_sims: int) -> bool:
+    """Whether a run of n_sims paths goes to the CUDA kernel."""
+    return HAS_CUDA and n_sims >= CUDA_MIN_SIMS
+
+
+def step_balances(balances: np.ndarray, growth: np.ndarray, lump: float,
+                  outflow: float, bs_factor: float) -> np.ndarray:
+    """Advance a (nS,) balances row by one year in place (see simulate_balances)."""
+    if HAS_NUMBA:
+        return _step_balances_numba(balances, growth, lump, outflow, bs_factor)
+    if HAS_AOT:
+        return _step_balances_aot(balances, growth, lump, outflow, bs_factor)
+    return _step_balances_numpy(balances, growth, lump, outflow, bs_factor)
+
+
+def simulate_balances(balances: np.ndarray, growth: np.ndarray, lump: np.ndarray,
+                      outflow: np.ndarray, bs_factor: np.ndarray) -> np.ndarray:
+    """
+    Fill balances[1:] in place from balances[0] using the mid-year withdrawal rule.
+
+    Args:
+        balances: (nY, nS) array with the starting balance in row 0
+        growth: (nY-1, nS) half-year growth factors, 1 + portfolio return / 2
+        lump, outflow, bs_factor: length-nY per-year tables (index 0 unused)
+    """
+    if use_gpu(balances.shape[1]):
+        return _simulate_balances_gpu(balances, growth, lump, outflow, bs_factor)
+    if HAS_NUMBA:
+        return _simulate_balances_numba(balances, growth, lump, outflow, bs_factor)
+    if HAS_AOT:
+        return _simulate_balances_aot(balances, growth, lump, outflow, bs_factor)
+    return _simulate_balances_numpy(balances, growth, lump, outflow, bs_factor)
+
+
+# ============================
+# Threading
+# ============================
+def physical_cores() -> int:
+    """
+    Physical cores this process may run on, counting hyperthread siblings once.
+    
+    Falls back to the logical CPU count where the Linux topology files are
+    not available.
+    """
+    cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else range(os.cpu_count() or 1)
+    siblings = set()
+    for cpu in cpus:
+        try:
+            siblings.add(Path(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list").read_text())
+        except OSError:
+            return max(1, len(cpus))
+    return max(1, len(siblings))
+
+
+def max_threads() -> int:
+    """Size of the thread pool behind the parallel kernels (1 without Numba)."""
+    return numba_config.NUMBA_NUM_THREADS if HAS_NUMBA else 1
+
+
+def set_threads(n: int) -> None:
+    """Cap the parallel kernels launched from the calling thread at n threads."""
+    if HAS_NUMBA:
+        set_num_threads(max(1, min(n, max_threads())))
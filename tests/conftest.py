@@ -2,16 +2,22 @@
 Shared fixtures for fat-tail algorithm testing.
 """
 
+import copy
+import json
 import sys
 import os
 import pytest
 import numpy as np
+from scipy import stats
 
 # Add backend to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'backend'))
 
 from models import Scenario, Account, Spending
-from monte_carlo.fat_tails_kou_logsafe import FatTailCfg, KouLog, MarketJumpLog
+from monte_carlo import Engine
+from monte_carlo.fat_tails_kou_logsafe import (
+    FatTailCfg, KouLog, MarketJumpLog, draw_fat_tailed_returns_kou_logsafe,
+)
 
 
 @pytest.fixture
@@ -89,6 +95,54 @@ def equity_only_scenario():
     }
 
 
+# Multi-account plans for fat-tail vs normal comparisons
+_COMPARISON_SCENARIOS = [
+    {
+        "name": "Well-Funded",
+        "current_age": 55,
+        "end_age": 90,
+        "accounts": [
+            {"kind": "401k", "balance": 1000000, "stocks": 0.6, "bonds": 0.4},
+            {"kind": "Taxable", "balance": 500000, "stocks": 0.5, "bonds": 0.5}
+        ],
+        "spending": {
+            "base_annual": 60000,
+            "reduced_annual": 60000,
+            "reduce_at_age": 65,
+            "inflation": 0.025
+        }
+    },
+    {
+        "name": "Marginal",
+        "current_age": 45,
+        "end_age": 90,
+        "accounts": [
+            {"kind": "401k", "balance": 800000, "stocks": 0.7, "bonds": 0.3},
+            {"kind": "Taxable", "balance": 400000, "stocks": 0.6, "bonds": 0.3, "cash": 0.1},
+            {"kind": "IRA", "balance": 300000, "stocks": 0.6, "bonds": 0.4}
+        ],
+        "consulting": {
+            "start_age": 46,
+            "years": 10,
+            "start_amount": 100000,
+            "growth": 0.02
+        },
+        "spending": {
+            "base_annual": 100000,
+            "reduced_annual": 70000,
+            "reduce_at_age": 65,
+            "inflation": 0.025
+        }
+    },
+]
+
+
+@pytest.fixture(params=_COMPARISON_SCENARIOS, ids=[s["name"] for s in _COMPARISON_SCENARIOS])
+def comparison_scenario(request):
+    """Each multi-account comparison plan in turn (a fresh copy per test)."""
+    return copy.deepcopy(request.param)
+
+
 @pytest.fixture
 def standard_fat_tail_cfg():
     """Standard fat-tail configuration."""
@@ -102,35 +156,64 @@ def standard_fat_tail_cfg():
     )
 
 
-@pytest.fixture
+def _frozen(values):
+    """Read-only array: shared parameters can't be mutated in place by code under test."""
+    arr = np.array(values)
+    arr.flags.writeable = False
+    return arr
+
+
+# Equity parameters: 8% expected return, 17% volatility
+_EQUITY_MU = _frozen([0.08])
+_EQUITY_SIGMA = _frozen([0.17])
+_EQUITY_COV = _frozen([[0.17**2]])
+
+# 60/40 portfolio parameters (stocks, bonds), correlation 0.1
+_PORTFOLIO_MU = _frozen([0.08, 0.04])
+_PORTFOLIO_COV = _frozen([
+    [0.17**2, 0.1 * 0.17 * 0.08],
+    [0.1 * 0.17 * 0.08, 0.08**2]
+])
+_PORTFOLIO_WEIGHTS = _frozen([0.6, 0.4])
+
+
+@pytest.fixture(scope="session")
 def equity_params():
     """Standard equity return parameters."""
     return {
-        "mu": np.array([0.08]),  # 8% expected return
-        "sigma": np.array([0.17]),  # 17% volatility
-        "cov": np.array([[0.17**2]])  # Covariance matrix
+        "mu": _EQUITY_MU,  # 8% expected return
+        "sigma": _EQUITY_SIGMA,  # 17% volatility
+        "cov": _EQUITY_COV  # Covariance matrix
     }
 
 
+@pytest.fixture(scope="module")
+def standard_equity_sample(equity_params):
+    """One 100k-sim year of standard fat-tailed equity returns, shared by the distribution tests."""
+    returns = draw_fat_tailed_returns_kou_logsafe(
+        mu_arith=equity_params["mu"],
+        cov_arith=equity_params["cov"],
+        assets=["stocks"],
+        n_years=1,
+        n_sims=100000,
+        cfg=FatTailCfg(enabled=True)
+    )
+    return returns[0, :, 0]
+
+
+@pytest.fixture(scope="module")
+def standard_equity_moments(standard_equity_sample):
+    """Single-pass scipy.stats.describe summary (mean, variance, skewness, ...) of the shared sample."""
+    return stats.describe(standard_equity_sample)
+
+
 @pytest.fixture
 def portfolio_params():
     """60/40 portfolio parameters."""
-    mu_stocks = 0.08
-    mu_bonds = 0.04
-    sigma_stocks = 0.17
-    sigma_bonds = 0.08
-    corr = 0.1
-    
-    mu = np.array([mu_stocks, mu_bonds])
-    cov = np.array([
-        [sigma_stocks**2, corr * sigma_stocks * sigma_bonds],
-        [corr * sigma_stocks * sigma_bonds, sigma_bonds**2]
-    ])
-    
     return {
-        "mu": mu,
-        "cov": cov,
-        "weights": np.array([0.6, 0.4])  # 60/40 weights
+        "mu": _PORTFOLIO_MU,
+        "cov": _PORTFOLIO_COV,
+        "weights": _PORTFOLIO_WEIGHTS  # 60/40 weights
     }
 
 
@@ -149,29 +232,27 @@ def tolerance():
 def run_simulation():
     """Factory fixture for running simulations."""
     def _run(scenario_dict, fat_tail_cfg=None):
-        from models import Scenario
-        from monte_carlo import Engine
-        
         scenario = Scenario(**scenario_dict)
-        
-        if fat_tail_cfg:
-            # Monkey-patch the config for testing
-            import monte_carlo.fat_tails_kou_logsafe as kou_module
-            original_init = kou_module.FatTailCfg.__init__
-            
-            def custom_init(self, **kwargs):
-                for key, value in fat_tail_cfg.__dict__.items():
-                    setattr(self, key, value)
-            
-            kou_module.FatTailCfg.__init__ = custom_init
-            
-        eng = Engine(scenario, fat_tail_engine="kou_logsafe")
-        result = eng.run()
-        
-        if fat_tail_cfg:
-            # Restore original
-            kou_module.FatTailCfg.__init__ = original_init
-            
-        return result
+        # The Kou engine uses fat_tail_cfg as-is (None: built from the CMAs)
+        eng = Engine(scenario, fat_tail_engine="kou_logsafe", fat_tail_cfg=fat_tail_cfg)
+        return eng.run()
+    
+    return _run
+
+
+@pytest.fixture(scope="session")
+def baseline_result_cache():
+    """Baseline (fat tails disabled) results shared across the session, keyed by scenario JSON."""
+    return {}
+
+
+@pytest.fixture
+def baseline_for(baseline_result_cache, run_simulation):
+    """Memoized run_simulation(scenario, FatTailCfg(enabled=False)) for impact tests."""
+    def _baseline(scenario_dict):
+        key = json.dumps(scenario_dict, sort_keys=True)
+        if key not in baseline_result_cache:
+            baseline_result_cache[key] = run_simulation(scenario_dict, FatTailCfg(enabled=False))
+        return baseline_result_cache[key]
     
-    return _run
\ No newline at end of file
+    return _baseline
@@ -11,117 +11,37 @@ from monte_carlo.fat_tails_kou_logsafe import FatTailCfg
 class TestPortfolioImpacts:
     """Test that fat-tail impacts on portfolio success rates are within target ranges."""
     
-    def test_standard_impact(self, standard_portfolio_scenario, run_simulation, tolerance):
-        """Test Standard configuration impact: -2% to -5% (flag at -1.5% or -5.5%)."""
-        scenario = standard_portfolio_scenario.copy()
-        
-        # Run baseline (no fat tails)
-        baseline_cfg = FatTailCfg(enabled=False)
-        baseline_result = run_simulation(scenario, baseline_cfg)
-        baseline_success = baseline_result["success_prob"]
-        
-        # Run with standard fat tails
-        standard_cfg = FatTailCfg(
-            enabled=True,
-            tail_magnitude="standard",
-            tail_frequency="standard",
-            tail_skew="neutral"
-        )
-        standard_result = run_simulation(scenario, standard_cfg)
-        standard_success = standard_result["success_prob"]
-        
-        # Calculate impact
-        impact = (standard_success - baseline_success) * 100
-        
-        # Check if within target range
-        target_min = -5.0
-        target_max = -2.0
-        flag_min = -6.0  # Flag if too extreme (allow slightly wider range)
-        flag_max = -1.5  # Flag if too mild
-        
-        assert flag_min <= impact <= flag_max, (
-            f"Standard impact {impact:.1f}% outside acceptable range [{flag_min}, {flag_max}]. "
-            f"Target: [{target_min}, {target_max}]"
-        )
-        
-        # Prefer being within target
-        if not (target_min <= impact <= target_max):
-            pytest.skip(f"Standard impact {impact:.1f}% outside target [{target_min}, {target_max}] but within acceptable range")
+    # (name, config overrides, acceptable impact range %, preferred target range % or None)
+    IMPACT_CASES = [
+        ("standard", dict(tail_magnitude="standard", tail_frequency="standard", tail_skew="neutral"),
+         (-6.0, -1.5), (-5.0, -2.0)),
+        ("extreme_magnitude", dict(tail_magnitude="extreme", tail_frequency="standard", tail_skew="neutral"),
+         (-8.5, -3.0), None),
+        ("high_frequency", dict(tail_magnitude="standard", tail_frequency="high", tail_skew="neutral"),
+         (-6.5, -2.5), None),
+        ("negative_skew", dict(tail_magnitude="standard", tail_frequency="standard", tail_skew="negative"),
+         (-7.5, -2.0), None),
+    ]
     
-    def test_extreme_magnitude_impact(self, standard_portfolio_scenario, run_simulation):
-        """Test Extreme Magnitude impact: -4% to -8%."""
+    @pytest.mark.parametrize("name,overrides,bounds,target", IMPACT_CASES,
+                             ids=[case[0] for case in IMPACT_CASES])
+    def test_impact(self, standard_portfolio_scenario, run_simulation, baseline_for,
+                    name, overrides, bounds, target):
+        """Test each configuration's success-rate impact against the baseline (no fat tails)."""
         scenario = standard_portfolio_scenario.copy()
         
-        # Run baseline
-        baseline_cfg = FatTailCfg(enabled=False)
-        baseline_result = run_simulation(scenario, baseline_cfg)
-        baseline_success = baseline_result["success_prob"]
+        baseline_success = baseline_for(scenario)["success_prob"]
+        result = run_simulation(scenario, FatTailCfg(enabled=True, **overrides))
+        impact = (result["success_prob"] - baseline_success) * 100
         
-        # Run with extreme magnitude
-        extreme_cfg = FatTailCfg(
-            enabled=True,
-            tail_magnitude="extreme",
-            tail_frequency="standard",
-            tail_skew="neutral"
+        lo, hi = bounds
+        assert lo <= impact <= hi, (
+            f"{name} impact {impact:.1f}% outside acceptable range [{lo}, {hi}]"
         )
-        extreme_result = run_simulation(scenario, extreme_cfg)
-        extreme_success = extreme_result["success_prob"]
-        
-        impact = (extreme_success - baseline_success) * 100
         
-        assert -8.5 <= impact <= -3.0, (
-            f"Extreme magnitude impact {impact:.1f}% outside range [-8.5, -3.0]"
-        )
-    
-    def test_high_frequency_impact(self, standard_portfolio_scenario, run_simulation):
-        """Test High Frequency impact: -3% to -6%."""
-        scenario = standard_portfolio_scenario.copy()
-        
-        # Run baseline
-        baseline_cfg = FatTailCfg(enabled=False)
-        baseline_result = run_simulation(scenario, baseline_cfg)
-        baseline_success = baseline_result["success_prob"]
-        
-        # Run with high frequency
-        high_freq_cfg = FatTailCfg(
-            enabled=True,
-            tail_magnitude="standard",
-            tail_frequency="high",
-            tail_skew="neutral"
-        )
-        high_freq_result = run_simulation(scenario, high_freq_cfg)
-        high_freq_success = high_freq_result["success_prob"]
-        
-        impact = (high_freq_success - baseline_success) * 100
-        
-        assert -6.5 <= impact <= -2.5, (
-            f"High frequency impact {impact:.1f}% outside range [-6.5, -2.5]"
-        )
-    
-    def test_negative_skew_impact(self, standard_portfolio_scenario, run_simulation):
-        """Test Negative Skew impact: -3% to -7%."""
-        scenario = standard_portfolio_scenario.copy()
-        
-        # Run baseline
-        baseline_cfg = FatTailCfg(enabled=False)
-        baseline_result = run_simulation(scenario, baseline_cfg)
-        baseline_success = baseline_result["success_prob"]
-        
-        # Run with negative skew
-        neg_skew_cfg = FatTailCfg(
-            enabled=True,
-            tail_magnitude="standard",
-            tail_frequency="standard",
-            tail_skew="negative"
-        )
-        neg_skew_result = run_simulation(scenario, neg_skew_cfg)
-        neg_skew_success = neg_skew_result["success_prob"]
-        
-        impact = (neg_skew_success - baseline_success) * 100
-        
-        assert -7.5 <= impact <= -2.0, (
-            f"Negative skew impact {impact:.1f}% outside range [-7.5, -2.0]"
-        )
+        # Prefer being within target
+        if target is not None and not (target[0] <= impact <= target[1]):
+            pytest.skip(f"{name} impact {impact:.1f}% outside target {list(target)} but within acceptable range")
     
     def test_black_swan_coordination(self, standard_portfolio_scenario, run_simulation):
         """Test that Black Swan coordination reduces market eta_neg appropriately."""
@@ -154,19 +74,19 @@ class TestPortfolioImpacts:
             f"Black Swan coordination not reducing impact as expected: {black_swan_result['success_prob']:.4f} vs {standard_result['success_prob']:.4f}"
         )
     
-    def test_all_configurations_relative_ordering(self, standard_portfolio_scenario, run_simulation):
+    def test_all_configurations_relative_ordering(self, standard_portfolio_scenario, run_simulation,
+                                                  baseline_for):
         """Test that impact ordering is: Baseline > Standard > Extreme, and Standard > Negative Skew."""
         scenario = standard_portfolio_scenario.copy()
         
         configs = {
-            "baseline": FatTailCfg(enabled=False),
             "standard": FatTailCfg(enabled=True, tail_magnitude="standard", tail_frequency="standard", tail_skew="neutral"),
             "extreme": FatTailCfg(enabled=True, tail_magnitude="extreme", tail_frequency="standard", tail_skew="neutral"),
             "high_freq": FatTailCfg(enabled=True, tail_magnitude="standard", tail_frequency="high", tail_skew="neutral"),
             "neg_skew": FatTailCfg(enabled=True, tail_magnitude="standard", tail_frequency="standard", tail_skew="negative"),
         }
         
-        results = {}
+        results = {"baseline": baseline_for(scenario)["success_prob"]}
         for name, cfg in configs.items():
             result = run_simulation(scenario, cfg)
             results[name] = result["success_prob"]
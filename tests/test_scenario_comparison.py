@@ -0,0 +1,56 @@
+"""
+Compare fat-tail and normal returns on realistic multi-account scenarios.
+Runs through the shared fixtures, so baselines are cached and xdist can spread them.
+"""
+
+import pytest
+
+
+def _with_fat_tails(scenario, fat_tails):
+    """Scenario copy with moderate (df=12) comparison CMAs and 10k sims."""
+    return {
+        **scenario,
+        "cma": {"fat_tails": fat_tails, "t_df": 12, "tail_boost": 1.0, "tail_prob": 0.020},
+        "sims": 10000,
+    }
+
+
+class TestScenarioComparison:
+    """Fat tails should cost a little success probability, never add any."""
+
+    def test_fat_tail_impact(self, comparison_scenario, run_simulation, baseline_for):
+        """Success-rate impact of fat tails vs normal returns (default CMA-driven config)."""
+        scenario = comparison_scenario
+        # cma.fat_tails=False never reaches the Kou engine, so the cached
+        # baseline is the plain normal-returns run
+        baseline = baseline_for(_with_fat_tails(scenario, False))
+        fattail = run_simulation(_with_fat_tails(scenario, True))
+        impact = (fattail["success_prob"] - baseline["success_prob"]) * 100
+
+        assert -8.0 <= impact <= 0.5, (
+            f"{scenario['name']} impact {impact:+.1f}% outside [-8.0, +0.5]"
+        )
+        assert (fattail["end_balance_percentiles"]["p50"]
+                <= baseline["end_balance_percentiles"]["p50"] * 1.02), (
+            f"{scenario['name']}: fat tails raised the median end balance"
+        )
+
+    def test_one_year_equity_returns(self, run_simulation):
+        """Implied 1-year returns of a 100% stock account have a sensible spread."""
+        scenario = {
+            "name": "ReturnTest",
+            "current_age": 55,
+            "end_age": 56,  # Just 1 year
+            "accounts": [
+                {"kind": "401k", "balance": 1000000, "stocks": 1.0}  # 100% stocks
+            ],
+            "spending": {"base_annual": 0, "reduced_annual": 0, "reduce_at_age": 65},
+            "cma": {"fat_tails": True, "t_df": 12},
+            "sims": 50000
+        }
+        percentiles = run_simulation(scenario)["end_balance_percentiles"]
+        p20, p50, p80 = (percentiles[k] / 1000000 - 1 for k in ("p20", "p50", "p80"))
+
+        assert p20 < 0.0 < p80, f"P20 {p20:.1%} / P80 {p80:.1%} do not straddle zero"
+        assert 0.04 <= p50 <= 0.10, f"Median return {p50:.1%} outside [4%, 10%]"
+        assert 0.20 <= p80 - p20 <= 0.45, f"P20-P80 spread {p80 - p20:.1%} outside [20%, 45%]"
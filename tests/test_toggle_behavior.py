@@ -3,6 +3,7 @@ Test toggle behavior for determinism and independence.
 Ensures toggles produce consistent and predictable results.
 """
 
+import itertools
 import pytest
 import numpy as np
 from monte_carlo.fat_tails_kou_logsafe import FatTailCfg, _apply_toggles
@@ -95,29 +96,25 @@ class TestToggleDeterminism:
 class TestToggleCombinations:
     """Test various toggle combinations."""
     
-    def test_all_toggle_combinations(self):
+    @pytest.mark.parametrize("mag,freq,skew", list(itertools.product(
+        ["standard", "extreme"], ["standard", "high"], ["negative", "neutral", "positive"]
+    )))
+    def test_all_toggle_combinations(self, mag, freq, skew):
         """Test all possible toggle combinations produce valid results."""
-        magnitudes = ["standard", "extreme"]
-        frequencies = ["standard", "high"]
-        skews = ["negative", "neutral", "positive"]
-        
-        for mag in magnitudes:
-            for freq in frequencies:
-                for skew in skews:
-                    cfg = FatTailCfg(
-                        enabled=True,
-                        tail_magnitude=mag,
-                        tail_frequency=freq,
-                        tail_skew=skew
-                    )
-                    
-                    per_adj, market_adj = _apply_toggles(cfg)
-                    
-                    # Check all parameters are valid
-                    assert market_adj.lam > 0, f"Invalid lam for {mag}/{freq}/{skew}"
-                    assert market_adj.eta_neg > 0, f"Invalid eta_neg for {mag}/{freq}/{skew}"
-                    assert market_adj.eta_pos > 0, f"Invalid eta_pos for {mag}/{freq}/{skew}"
-                    assert 0 <= market_adj.p_pos <= 1, f"Invalid p_pos for {mag}/{freq}/{skew}"
+        cfg = FatTailCfg(
+            enabled=True,
+            tail_magnitude=mag,
+            tail_frequency=freq,
+            tail_skew=skew
+        )
+        
+        per_adj, market_adj = _apply_toggles(cfg)
+        
+        # Check all parameters are valid
+        assert market_adj.lam > 0, f"Invalid lam for {mag}/{freq}/{skew}"
+        assert market_adj.eta_neg > 0, f"Invalid eta_neg for {mag}/{freq}/{skew}"
+        assert market_adj.eta_pos > 0, f"Invalid eta_pos for {mag}/{freq}/{skew}"
+        assert 0 <= market_adj.p_pos <= 1, f"Invalid p_pos for {mag}/{freq}/{skew}"
     
     def test_high_frequency_special_boost(self):
         """Test that high frequency applies special boost to market eta_neg."""